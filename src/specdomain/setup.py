@@ -10,6 +10,10 @@ long_desc = short_desc + '\n'*2 + open('README').read()
 version = open('VERSION').read().strip()
 
 requires = ['Sphinx>=1.1.1']
+extras = {
+    # faster directory walks on Python < 3.5 (later versions have os.scandir)
+    'scandir': ['scandir'],
+}
 
 # classifiers: http://pypi.python.org/pypi?%3Aaction=list_classifiers
 
@@ -38,5 +42,6 @@ setup(
     packages=find_packages(exclude=['comparison', 'macros', 'test', 'doc', 'markup_example', ]),
     include_package_data=True,
     install_requires=requires,
+    extras_require=extras,
     namespace_packages=['sphinxcontrib'],
 )
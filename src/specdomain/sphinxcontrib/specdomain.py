@@ -16,10 +16,14 @@
 
 # http://sphinx.pocoo.org/ext/appapi.html
 
+import codecs
 import os
 import re
+from collections import deque
 
 from docutils import nodes
+from docutils.parsers.rst import Directive, directives
+from docutils.statemachine import StringList
 
 from sphinx import addnodes
 from sphinx.roles import XRefRole
@@ -28,16 +32,20 @@ from sphinx.directives import ObjectDescription
 from sphinx.domains import Domain, ObjType
 from sphinx.util.nodes import make_refnode
 from sphinx.util.docfields import Field, TypedField
-from sphinx.util.docstrings import prepare_docstring
 
 from sphinx.ext.autodoc import Documenter, bool_option
-from specmacrofileparser import SpecMacrofileParser
+try:
+    from sphinx.util import logging
+except ImportError:         # Sphinx < 1.6:  log with the application
+    logging = None
+from specmacrofileparser import SpecMacrofileParser, parse_cdef_args, cdef_fields, file_digest
+from specmacrofilecache import SpecDiskCache, SpecParserCache, SpecReSTCache
+from specmacrodir import SpecMacroDirWalker, DEFAULT_INCLUDE
 
 
 # TODO: merge these with specmacrofileparser.py
 match_all                   = r'.*'
 non_greedy_filler           = match_all + r'?'
-double_quote_string_match   = r'("' + non_greedy_filler + r'")'
 word_match                  = r'((?:[a-z_]\w*))'
 cdef_match                  = r'(cdef)'
 
@@ -51,19 +59,136 @@ spec_func_sig_re = re.compile(word_match + r'\('
                       + r'\)', 
                       re.IGNORECASE|re.DOTALL)
 
-spec_cdef_name_sig_re = re.compile(double_quote_string_match, 
-                                   re.IGNORECASE|re.DOTALL)
-
 # this tool is valuable:  http://www.pythonregex.com/
 spec_macro_file_re_str = "\w*.mac"  # TRAC #29: can user provide somehow (can't get to it from here if defined in conf.py)?
 spec_macro_file_re = re.compile(spec_macro_file_re_str)
 
+logger = None
+if logging is not None:
+    logger = logging.getLogger(__name__)
+
+# parsers of the macro files read during this build (reset when the builder starts)
+parser_cache = SpecParserCache()
+# reST rendered from the macro files (by content, kept between builds)
+rest_cache = SpecReSTCache()
+
 
 def isSpecMacroFile(filename):
     '''is filename a SPEC macro file?'''
     return os.path.isfile(filename) and len(spec_macro_file_re.findall(filename)) > 0
 
 
+def parse_cache(env):
+    '''the on-disk cache of parser findings for this build (None if not configured)'''
+    config = env.config
+    if not config.autospecmacro_cache:
+        return None
+    cachedir = config.autospecmacro_cache_dir or os.path.join(env.doctreedir, 'specmacro')
+    return SpecDiskCache(os.path.join(env.srcdir, cachedir), config.autospecmacro_cache_size)
+
+
+def is_streamed(env, macrofile):
+    '''
+    is *macrofile* parsed as it is rendered?
+    
+    Files of at least ``autospecmacro_stream_size`` bytes are parsed 
+    as they are rendered (and not cached), so that they are never
+    held in memory all at once.
+    '''
+    stream_size = env.config.autospecmacro_stream_size
+    return stream_size and os.path.getsize(macrofile) >= stream_size
+
+
+def macro_rest(env, macrofile, style = 'simple'):
+    '''
+    the reST for *macrofile*:  (content hash, lines, parse warnings)
+    
+    Each of the lines is (text, part), as from :func:`prepare_rest_parts`,
+    each parse warning is (line number, text).
+    Unless the file is streamed, the lines are kept in the reST cache,
+    so that the file is parsed and rendered only when its content changes.
+    '''
+    if not os.path.isfile(macrofile):
+        raise RuntimeError, "file not found: " + macrofile
+    if is_streamed(env, macrofile):
+        spec = SpecMacrofileParser(macrofile, stream=True)
+        lines = prepare_rest_parts(spec.iter_ReST_parts(style))
+        def warnings():
+            # found as the lines are rendered, so look only after that
+            for item in spec.warnings:
+                yield item.start_line, item.text
+        return None, lines, warnings()
+    cache = parse_cache(env)
+    digest = file_digest(macrofile)
+    key = (digest, style, macrofile)
+    entry = rest_cache.get(key, cache=cache)
+    if entry is None:
+        spec = parser_cache.parser(macrofile, cache=cache)
+        lines = []
+        parts = {}          # line number: part that starts there
+        for text, part in prepare_rest_parts(spec.iter_ReST_parts(style)):
+            if part is not None:
+                parts[len(lines)] = part
+            lines.append(text)
+        warnings = [(item.start_line, item.text) for item in spec.warnings]
+        entry = (lines, parts, warnings)
+        rest_cache.put(key, entry, cache=cache)
+    lines, parts, warnings = entry
+    return digest, ((text, parts.get(i)) for i, text in enumerate(lines)), warnings
+
+
+def prefetch_parsers(env, macrofiles):
+    '''
+    parse *macrofiles* in ``autospecmacro_parse_workers`` parallel processes
+    (unless that is 1), before they are documented one at a time
+    
+    Files that are streamed, or whose reST is cached, are not parsed.
+    '''
+    workers = env.config.autospecmacro_parse_workers
+    if workers == 1:
+        return
+    cache = parse_cache(env)
+    macrofiles = [f for f in macrofiles 
+                  if not is_streamed(env, f)
+                  and not rest_cache.has((file_digest(f), 'simple', f), cache=cache)]
+    if len(macrofiles) > 1:
+        parser_cache.prefetch(macrofiles, cache=cache, workers=workers or None)
+
+
+def prepare_rest_parts(parts):
+    '''
+    generator: as :func:`prepare_docstring`, for reST as it is rendered
+    
+    The parser's reST always has lines that start in the first column,
+    so no common indentation is removed.
+    
+    :param parts: (lines, part) from :meth:`SpecMacrofileParser.iter_ReST_parts`
+    :returns: (text, (part, number of lines)) for the first line of each
+        part that could be made into nodes directly, (text, None) for the others
+    '''
+    started = False
+    i = 0
+    line = ''
+    for lines, part in parts:
+        first = part is not None
+        for line in lines:
+            line = line.expandtabs()
+            if i == 0:
+                line = line.lstrip()
+            i += 1
+            if not started:
+                if not line:
+                    continue        # remove any leading blank lines
+                started = True
+            if first:
+                yield line, (part, len(lines))
+                first = False
+            else:
+                yield line, None
+    if line:
+        yield '', None      # make sure there is an empty line at the end
+
+
 class SpecMacroDocumenter(Documenter):
     """
     Document a SPEC macro source code file (autodoc.Documenter subclass)
@@ -138,9 +263,8 @@ class SpecMacroDocumenter(Documenter):
         macrofile_prefix = '../'*dir_levels
         # </hack>
 
-        spec = SpecMacrofileParser(macrofile)
-        extended_comment = spec.ReST()
-        rest = prepare_docstring(extended_comment)
+        digest, rest, warnings = macro_rest(self.directive.env, macrofile)
+        self.directive.env.get_domain('spec').note_macrofile(macrofile, digest)
 
         #self.add_line(u'', '<autodoc>')
         #sig = self.format_signature()
@@ -158,16 +282,49 @@ class SpecMacroDocumenter(Documenter):
         self.add_line(u'', '<autodoc>')
         # TODO: provide links from each to highlighted source code blocks (like Python documenters).
         # This will have to do for now.
-        line = 'source code:  :download:`%s <%s>`' % (os.path.basename(macrofile), macrofile_prefix+macrofile)
+        if os.path.isabs(macrofile):
+            # relative to the document (Sphinx reads /path as relative to the source directory)
+            target = os.path.relpath(macrofile, os.path.dirname(sdir))
+        else:
+            target = macrofile_prefix + macrofile
+        line = 'source code:  :download:`%s <%s>`' % (os.path.basename(macrofile), target)
         self.add_line(line, macrofile)
 
         self.add_line(u'', '<autodoc>')
-        for linenumber, line in enumerate(rest):
+        if self.directive.env.config.autospecmacro_renderer == 'nodes':
+            lines = self.node_placeholders(rest)
+        else:
+            lines = (line for line, part in rest)       #@UnusedVariable
+        for linenumber, line in enumerate(lines):
             self.add_line(line, macrofile, linenumber)
+        for linenumber, text in warnings:
+            self.directive.warn('%s:%d: %s' % (macrofile, linenumber, text))
 
         #self.add_content(rest)
         #self.document_members(all_members)
 
+    def node_placeholders(self, rest):
+        '''
+        generator: the lines of *rest*, where each part that can be made 
+        into nodes directly starts with a :class:`SpecNodesDirective` instead
+        
+        The other lines of a table become the content of that directive,
+        so that all the lines keep their line numbers.
+        '''
+        parts = self.directive.env.temp_data.setdefault('autospecmacro-nodes', deque())
+        indent = 0
+        for line, part in rest:
+            if indent > 0:
+                indent -= 1
+                line = '   ' + line
+            elif part is not None:
+                part, count = part
+                parts.append(part)
+                line = '.. autospecmacro-nodes::'
+                if part[0] == 'table':
+                    indent = count - 1      # the top border is replaced
+            yield line
+
     def resolve_name(self, modname, parents, path, base):
         if modname is not None:
             self.directive.warn('"::" in autospecmacro name doesn\'t make sense')
@@ -189,6 +346,18 @@ class SpecMacroDocumenter(Documenter):
         return ret
 
 
+def true_false_option(argument):
+    '''
+    option that is True when given alone, or as *true* or *false* 
+    (also *yes*/*no*, *on*/*off*, *1*/*0*)
+    '''
+    if argument is None or not argument.strip():
+        return True
+    value = directives.choice(argument.strip().lower(), 
+                              ('true', 'yes', 'on', '1', 'false', 'no', 'off', '0'))
+    return value in ('true', 'yes', 'on', '1')
+
+
 class SpecDirDocumenter(Documenter):
     """
     Document a directory containing SPEC macro source code files.
@@ -203,7 +372,10 @@ class SpecDirDocumenter(Documenter):
     #: true if the generated content may contain titles
     titles_allowed = True
     option_spec = {
-        'include_subdirs': bool_option,
+        'include_subdirs': true_false_option,
+        'include': directives.unchanged,
+        'exclude': directives.unchanged,
+        'pages': bool_option,
     }
 
     @classmethod
@@ -221,18 +393,24 @@ class SpecDirDocumenter(Documenter):
 #        self.add_line(u'directory:\n   ``%s``' % specdir, '<autodoc>')
         macrofiles = []
         if os.path.exists(specdir):
-            # TODO: support a user choice for pattern match to the file name (glob v. re)
-            # see https://subversion.xray.aps.anl.gov/trac/bcdaext/ticket/29
-            for f in sorted(os.listdir(specdir)):
-                filename = os.path.join(specdir, f)
-                if isSpecMacroFile(filename):
-                    # TODO: support the option to include subdirectories (include_subdirs)
-                    # TODO: do not add the same SPEC macro file more than once
-                    macrofiles.append(filename)
+            macrofiles = macrodir_walker(self.directive.env.config, self.options).walk(specdir)
         else:
             self.add_line(u'', '<autodoc>')
             self.add_line(u'Could not find directory: ``%s``' % specdir, '<autodoc>')
-        if len(macrofiles) > 0:
+        self.directive.env.get_domain('spec').note_macrodir(specdir, self.options, macrofiles)
+        if len(macrofiles) > 0 and separate_pages(self.directive.env.config, self.options):
+            # each file is documented on its own page, written by generate_macrofile_pages()
+            self.add_line(u'', '<autodoc>')
+            self.add_line(u'.. rubric:: List of SPEC Macro Files in *%s*' % specdir, '<autodoc>')
+            self.add_line(u'', '<autodoc>')
+            self.add_line(u'.. toctree::', '<autodoc>')
+            self.add_line(u'   :maxdepth: 1', '<autodoc>')
+            self.add_line(u'', '<autodoc>')
+            for filename in macrofiles:
+                pagename = macrofile_pagename(self.directive.env, filename)
+                self.add_line(u'   /%s' % pagename, '<autodoc>')
+        elif len(macrofiles) > 0:
+            prefetch_parsers(self.directive.env, macrofiles)
             self.add_line(u'', '<autodoc>')
             self.add_line(u'.. rubric:: List of SPEC Macro Files in *%s*' % specdir, '<autodoc>')
             self.add_line(u'', '<autodoc>')
@@ -253,6 +431,86 @@ class SpecDirDocumenter(Documenter):
                 self.add_line(u'-'*15, '<autodoc>')         # delimiter between files
 
 
+class SpecNodesDirective(Directive):
+    """
+    Nodes for a part of the reST of a SPEC macro file, made directly
+    
+    With ``autospecmacro_renderer = 'nodes'``, :class:`SpecMacroDocumenter`
+    puts this directive in place of the summary tables and the directives that
+    describe the findings, each in the order they are parsed.  The nodes are 
+    the same as those from the reST, but the tables are not parsed.  
+    A finding is described by the domain's own directive, called directly 
+    (its description is reST, still parsed as the content of this directive).
+    """
+    
+    has_content = True
+    
+    # table cells that are one paragraph of text, so need not be parsed as a block
+    plain_cell_re = re.compile(r'\w')
+    enumerator_re = re.compile(r'(\d+|[a-zA-Z]|[ivxlcdm]+|[IVXLCDM]+)[.)](\s|$)')
+    
+    def run(self):
+        env = self.state.document.settings.env
+        part = env.temp_data['autospecmacro-nodes'].popleft()
+        if part[0] == 'desc':
+            return self.desc(*part[1:])
+        return self.table(*part[1:])
+    
+    def desc(self, objtype, name, args):
+        """the index and desc nodes of a finding, from its ``spec:`` directive"""
+        sig = u'' + name        # as the reST would be (autodoc adds u'' to each line)
+        if args is not None:
+            sig = u'%s(%s)' % (name, args)
+        directive = SpecDomain.directives[objtype]('spec:' + objtype, [sig], {}, 
+                                                   self.content, self.lineno, 
+                                                   self.content_offset, self.block_text, 
+                                                   self.state, self.state_machine)
+        return directive.run()
+    
+    def table(self, labels, rows):
+        """a table node, as from a reST simple table"""
+        columns = zip(labels, *rows)
+        table = nodes.table()
+        tgroup = nodes.tgroup(cols=len(columns))
+        table += tgroup
+        for column in columns:
+            tgroup += nodes.colspec(colwidth=max([len(item) for item in column]))
+        # lines of the table:  border, labels, border, rows, border
+        thead = nodes.thead()
+        tgroup += thead
+        thead += self.table_row(labels, self.lineno + 1)
+        tbody = nodes.tbody()
+        tgroup += tbody
+        for i, row in enumerate(rows):
+            tbody += self.table_row(row, self.lineno + 3 + i)
+        return [table]
+    
+    def table_row(self, cells, lineno):
+        """a row node, for *cells* in the line at *lineno*"""
+        row = nodes.row()
+        for text in cells:
+            entry = nodes.entry()
+            row += entry
+            if not text:
+                continue
+            text = u'' + text
+            source, line = self.state_machine.get_source_and_line(lineno)
+            if (self.plain_cell_re.match(text) is None 
+                or self.enumerator_re.match(text) is not None
+                or text.endswith('::')):
+                # could be any body element:  parse it
+                block = StringList([text], items=[(source, line - 1)])
+                self.state.nested_parse(block, lineno - 1, entry)
+                continue
+            # (the parser reports inline markup at the line after a paragraph)
+            textnodes, messages = self.state.inline_text(text, lineno + 1)
+            paragraph = nodes.paragraph(text, '', *textnodes)
+            paragraph.source, paragraph.line = source, line
+            entry += paragraph
+            entry += messages
+        return row
+
+
 class SpecMacroObject(ObjectDescription):
     """
     Description of a SPEC macro definition
@@ -274,6 +532,7 @@ class SpecMacroObject(ObjectDescription):
         targetname = 'macro:%s:%s:%s:%s' % (self.objtype, name, signode.source, str(signode.line))
         signode['ids'].append(targetname)
         self.state.document.note_explicit_target(signode)
+        self.env.get_domain('spec').note_object(self.objtype, name, targetname)
         indextext = self._get_index_text(name)
         if indextext:
             self.indexnode['entries'].append(('single', indextext, targetname, ''))
@@ -313,13 +572,10 @@ class SpecMacroObject(ObjectDescription):
         if len(arglist) > 1:
             args = arglist[1:]
             if name == 'cdef':
-                # TODO: need to match complete arg list
                 # several different signatures are possible (see cdef-examples.mac)
-                # for now, just get the macro name and ignore the arg list
-                m = spec_cdef_name_sig_re.match(args[0])
-                arglist = m.groups()
-                name = arglist[0].strip('"')
-                args = ['<<< cdef argument list not handled yet >>>']       # FIXME:
+                cdef = cdef_fields(parse_cdef_args(args[0]))
+                name = cdef['name']
+                args = cdef['args']
         signode += addnodes.desc_name(name, name)
         if len(args) > 0:
             signode += addnodes.desc_addname(args, args)
@@ -333,7 +589,6 @@ class SpecVariableObject(ObjectDescription):
     
     # TODO: The directive that declares the variable should be the primary (bold) index.
     # TODO: array variables are not handled at all
-    # TODO: variables cited by *role* should link back to their *directive* declarations
 
     def handle_signature(self, sig, signode):
         '''return the name of this object from its signature'''
@@ -347,7 +602,7 @@ class SpecVariableObject(ObjectDescription):
         text = name.split()[0]   # when sig = "tth    #: scattering angle"
         targetname = 'var:%s:%s:%s:%s' % (self.objtype, text, signode.source, str(signode.line))
         signode['ids'].append(targetname)
-        # TODO: role does not point back to it yet
+        self.env.get_domain('spec').note_object(self.objtype, text, targetname)
         # http://sphinx.pocoo.org/markup/misc.html#directive-index
         self.indexnode['entries'].append(('single', text, targetname, ''))
         text = u'SPEC %s variable; %s' % (self.objtype, sig)
@@ -365,6 +620,11 @@ class SpecXRefRole(XRefRole):
         key = ":".join((refnode['refdomain'], refnode['reftype']))
         value = env.temp_data.get(key)
         refnode[key] = value
+        if refnode['reftype'] == 'cdef':
+            m = spec_func_sig_re.match(target)
+            if m is not None and m.group(1) == 'cdef':
+                # cdef("name", ...) refers to the chained macro by its name
+                target = cdef_fields(parse_cdef_args(m.group(2)))['name']
         if not has_explicit_title:
             title = title.lstrip(':')   # only has a meaning for the target
             target = target.lstrip('~') # only has a meaning for the title
@@ -405,8 +665,8 @@ class SpecDomain(Domain):
     label = 'SPEC, http://www.certif.com'
     object_types = {    # type of object that a domain can document
         'def':        ObjType(l_('def'),        'def'),
-        'rdef':       ObjType(l_('rdef'),       'rdef'),
-        'cdef':       ObjType(l_('cdef'),       'cdef'),
+        'rdef':       ObjType(l_('rdef'),       'rdef', 'def'),
+        'cdef':       ObjType(l_('cdef'),       'cdef', 'def'),
         'global':     ObjType(l_('global'),     'global'),
         'local':      ObjType(l_('local'),      'local'),
         'constant':   ObjType(l_('constant'),   'constant'),
@@ -429,28 +689,349 @@ class SpecDomain(Domain):
         'constant': SpecXRefRole(),
     }
     initial_data = {
-        'objects': {}, # fullname -> docname, objtype
+        'objects': {}, # (objtype, name) -> docname, target id
+        'names': {},   # name -> [(docname, target id, objtype)], the last one noted at the end
+        'docs': {},    # docname -> set of (objtype, name) noted there
+        'macrofiles': {},   # docname -> {absolute path: ((mtime, size), content hash)}
+        'macrodirs': {},    # docname -> [(directory, options, [macro files found])]
     }
+    data_version = 5
+
+    def note_object(self, objtype, name, targetname):
+        '''remember where the object *name* of *objtype* is described'''
+        docname = self.env.docname
+        self.data['objects'][objtype, name] = (docname, targetname)
+        _note_name(self.data['names'], name, (docname, targetname, objtype))
+        self.data['docs'].setdefault(docname, set()).add((objtype, name))
+
+    def note_macrofile(self, macrofile, digest = None):
+        '''
+        remember that *macrofile* is documented in the current document
+        
+        :param str macrofile: name (with optional path) of SPEC macro file
+        :param str digest: (optional) content hash of the file, if known
+        '''
+        filename = os.path.abspath(macrofile)
+        st = os.stat(filename)
+        if digest is None:
+            digest = file_digest(filename)
+        macrofiles = self.data['macrofiles'].setdefault(self.env.docname, {})
+        macrofiles[filename] = ((st.st_mtime, st.st_size), digest)
+
+    def note_macrodir(self, specdir, options, macrofiles):
+        '''
+        remember the macro files an ``autospecdir`` directive of the current
+        document found in *specdir*, with its *options*
+        '''
+        macrodirs = self.data['macrodirs'].setdefault(self.env.docname, [])
+        macrodirs.append((specdir, dict(options), list(macrofiles)))
+
+    def changed_macrodir_docs(self):
+        '''
+        names of the documents with an ``autospecdir`` directive that 
+        would now find other macro files (added, removed, or renamed)
+        '''
+        changed = set()
+        found = {}          # (directory, options): macro files
+        config = self.env.config
+        for docname, macrodirs in self.data['macrodirs'].items():
+            for specdir, options, macrofiles in macrodirs:
+                key = (specdir, tuple(sorted(options.items())))
+                if key not in found:
+                    found[key] = []
+                    if os.path.exists(specdir):
+                        found[key] = macrodir_walker(config, options).walk(specdir)
+                if found[key] != macrofiles:
+                    changed.add(docname)
+        return changed
+
+    def changed_macrofile_docs(self):
+        '''
+        names of the documents with a macro file whose content has changed
+        
+        A file is hashed again only when its modification time or size
+        has changed, so a file that was only touched does not make
+        its documents out of date.
+        '''
+        changed = set()
+        digests = {}        # absolute path: content hash, or None if gone
+        for docname, macrofiles in self.data['macrofiles'].items():
+            for filename, (stamp, digest) in macrofiles.items():
+                try:
+                    st = os.stat(filename)
+                except OSError:
+                    changed.add(docname)
+                    continue
+                if (st.st_mtime, st.st_size) == stamp:
+                    continue
+                if filename not in digests:
+                    digests[filename] = file_digest(filename)
+                if digests[filename] != digest:
+                    changed.add(docname)
+                else:
+                    macrofiles[filename] = ((st.st_mtime, st.st_size), digest)
+        return changed
 
     def clear_doc(self, docname):
-        for (typ, name), doc in self.data['objects'].items():
-            if doc == docname:
-                del self.data['objects'][typ, name]
+        self.data['macrofiles'].pop(docname, None)
+        self.data['macrodirs'].pop(docname, None)
+        objects = self.data['objects']
+        names = self.data['names']
+        for key in self.data['docs'].pop(docname, ()):
+            objtype, name = key
+            entries = [entry for entry in names.get(name, ()) if entry[0] != docname]
+            if len(entries) > 0:
+                names[name] = entries
+            else:
+                names.pop(name, None)
+            if key in objects and objects[key][0] == docname:
+                # another document may also describe it
+                del objects[key]
+                for entry in reversed(entries):
+                    if entry[2] == objtype:
+                        objects[key] = entry[:2]
+                        break
+
+    def find_object(self, objtypes, target):
+        '''
+        (docname, target id, objtype) of the object *target*
+        of one of *objtypes*, or None if not found
+        '''
+        if len(objtypes) > 1:
+            for entry in reversed(self.data['names'].get(target, ())):
+                if entry[2] in objtypes:
+                    return entry
+        objects = self.data['objects']
+        for objtype in objtypes:
+            entry = objects.get((objtype, target))
+            if entry is not None:
+                return entry + (objtype,)
+        return None
 
     def resolve_xref(self, env, fromdocname, builder, typ, target, node,
                      contnode):
+        entry = self.find_object(self.objtypes_for_role(typ), target)
+        if entry is not None:
+            docname, targetname, objtype = entry
+            return make_refnode(builder, fromdocname, docname, targetname,
+                                contnode, target + ' ' + objtype)
+
+    def resolve_any_xref(self, env, fromdocname, builder, target, node,
+                         contnode):
+        entries = self.data['names'].get(target)
+        if not entries:
+            return []
+        docname, targetname, objtype = entries[-1]
+        return [('spec:' + self.role_for_objtype(objtype),
+                 make_refnode(builder, fromdocname, docname, targetname,
+                              contnode, target + ' ' + objtype))]
+
+    def merge_domaindata(self, docnames, otherdata):
+        '''take the objects of *docnames*, read in another process (parallel builds)'''
         objects = self.data['objects']
-        objtypes = self.objtypes_for_role(typ)
-        for objtype in objtypes:
-            if (objtype, target) in objects:
-                return make_refnode(builder, fromdocname,
-                                    objects[objtype, target],
-                                    objtype + '-' + target,
-                                    contnode, target + ' ' + objtype)
+        names = self.data['names']
+        docs = self.data['docs']
+        for docname in docnames:
+            if docname in otherdata['macrofiles']:
+                self.data['macrofiles'][docname] = otherdata['macrofiles'][docname]
+            if docname in otherdata['macrodirs']:
+                self.data['macrodirs'][docname] = otherdata['macrodirs'][docname]
+            keys = otherdata['docs'].get(docname)
+            if not keys:
+                continue
+            docs.setdefault(docname, set()).update(keys)
+            for key in keys:
+                entry = otherdata['objects'].get(key)
+                if entry is not None and entry[0] == docname:
+                    objects[key] = entry
+                for entry in otherdata['names'].get(key[1], ()):
+                    if entry[0] == docname and entry[2] == key[0]:
+                        _note_name(names, key[1], entry)
 
     def get_objects(self):
-        for (typ, name), docname in self.data['objects'].iteritems():
-            yield name, name, typ, docname, typ + '-' + name, 1
+        for (typ, name), (docname, targetname) in self.data['objects'].iteritems():
+            yield name, name, typ, docname, targetname, 1
+
+
+def _note_name(names, name, entry):
+    '''add *entry* (docname, target id, objtype) to the entries of *name*, replacing its own'''
+    entries = names.setdefault(name, [])
+    for i, (docname, targetname, objtype) in enumerate(entries):      #@UnusedVariable
+        if docname == entry[0] and objtype == entry[2]:
+            del entries[i]
+            break
+    entries.append(entry)
+
+
+def macrodir_walker(config, options):
+    '''
+    finds the SPEC macro files of an ``autospecdir`` directive, 
+    as chosen by its *options* and the configuration
+    
+    The options *include* and *exclude* are comma-separated glob patterns
+    (as are also allowed for ``autospecmacrodir_include`` and 
+    ``autospecmacrodir_exclude``), matched to the file path relative 
+    to the directory.  The option *include_subdirs*, when given (true or false),
+    overrides ``autospecmacrodir_process_subdirs``.
+    '''
+    subdirs = options.get('include_subdirs')
+    if subdirs is None:
+        subdirs = config.autospecmacrodir_process_subdirs
+    include = options.get('include') or config.autospecmacrodir_include
+    exclude = options.get('exclude') or config.autospecmacrodir_exclude
+    return SpecMacroDirWalker(subdirs=subdirs, include=include, exclude=exclude,
+                              workers=config.autospecmacrodir_walk_workers)
+
+
+def separate_pages(config, options):
+    '''does this ``autospecdir`` directive document each file on its own page?'''
+    return bool(options.get('pages') or config.autospecmacrodir_pages)
+
+
+def macrofile_pagename(env, macrofile):
+    '''
+    name of the page that documents *macrofile* on its own
+    
+    The page is in ``autospecmacrodir_pages_dir``, at the path of the macro file
+    relative to the source directory (each ``..`` becomes ``__``).
+    '''
+    path = os.path.relpath(os.path.abspath(macrofile), env.srcdir)
+    parts = [{os.pardir: '__'}.get(part, part) for part in path.split(os.sep)]
+    pagesdir = env.config.autospecmacrodir_pages_dir.replace(os.sep, '/').strip('/')
+    return '/'.join([pagesdir] + parts)
+
+
+autospecdir_re = re.compile(r'^(\s*)\.\.\s+autospecdir::\s*(\S.*?)\s*$')
+directive_option_re = re.compile(r'^(\s+):([\w-]+):\s*(.*?)\s*$')
+# first line of each page written by generate_macrofile_pages()
+macrofile_page_marker = '.. This page is written by autospecdir.  Do not edit.'
+
+
+def find_autospecdir(filename, encoding = 'utf-8'):
+    '''generator: (directory, options) of each ``autospecdir`` directive in *filename*'''
+    with codecs.open(filename, 'r', encoding, 'replace') as f:
+        lines = f.read().splitlines()
+    for i, line in enumerate(lines):
+        mo = autospecdir_re.match(line)
+        if mo is None:
+            continue
+        indent, specdir = mo.groups()
+        options = {}
+        for line in lines[i+1:]:
+            mo = directive_option_re.match(line)
+            if mo is None or len(mo.group(1)) <= len(indent):
+                break
+            name, value = mo.group(2), mo.group(3) or None
+            try:
+                options[name] = SpecDirDocumenter.option_spec.get(name, directives.unchanged)(value)
+            except ValueError:
+                pass        # reported when the directive is read
+        yield specdir, options
+
+
+def generate_macrofile_pages(app):
+    '''
+    write a page for each SPEC macro file documented by an ``autospecdir`` 
+    directive with separate pages, and remove those no longer documented
+    
+    Each page is a separate document, so it is read again only when 
+    its own macro file changes, and the pages can be read and written 
+    in parallel.  A page is written only when its content changes.
+    As with *autosummary*, the documents are those found by the previous 
+    build (or when the environment was created).
+    '''
+    env = app.builder.env
+    config = env.config
+    pages = {}          # file name: content
+    for docname in sorted(env.found_docs):
+        filename = env.doc2path(docname)
+        if not os.path.isfile(filename):
+            continue
+        for specdir, options in find_autospecdir(filename, config.source_encoding):
+            if not separate_pages(config, options) or not os.path.isdir(specdir):
+                continue
+            for macrofile in macrodir_walker(config, options).walk(specdir):
+                pagename = macrofile_pagename(env, macrofile)
+                content = '\n'.join([
+                    macrofile_page_marker,
+                    '',
+                    '.. _%s:' % macrofile,
+                    '',
+                    '.. autospecmacro:: %s' % macrofile,
+                    '',
+                ])
+                pages[env.doc2path(pagename)] = content
+    for filename, content in sorted(pages.items()):
+        if _read_file(filename) != content:
+            dirname = os.path.dirname(filename)
+            if not os.path.exists(dirname):
+                os.makedirs(dirname)
+            with open(filename, 'w') as f:
+                f.write(content)
+    pagesdir = os.path.join(env.srcdir, config.autospecmacrodir_pages_dir)
+    for path, dirnames, filenames in os.walk(pagesdir):       #@UnusedVariable
+        for name in filenames:
+            filename = os.path.join(path, name)
+            if filename not in pages and (_read_file(filename, 100) or '').startswith(macrofile_page_marker):
+                os.remove(filename)
+
+
+def _read_file(filename, size = -1):
+    '''content of *filename* (up to *size* bytes), or None if it cannot be read'''
+    try:
+        with open(filename) as f:
+            return f.read(size)
+    except IOError:
+        return None
+
+
+def outdated_macrofile_docs(app, env, added, changed, removed):
+    '''
+    documents to read again because a macro file they document has changed,
+    or an ``autospecdir`` directive would find other macro files
+    '''
+    # (some Sphinx versions pass the builder as *env*)
+    domain = app.env.get_domain('spec')
+    docs = domain.changed_macrofile_docs() | domain.changed_macrodir_docs()
+    return sorted(docs - added - changed - removed)
+
+
+def drop_macrofile_dependencies(app, env):
+    '''
+    leave the macro files to :func:`outdated_macrofile_docs`
+    
+    The ``:download:`` link to each macro file makes it a dependency
+    that Sphinx checks by modification time alone.
+    '''
+    for docname, macrofiles in env.get_domain('spec').data['macrofiles'].items():
+        deps = env.dependencies.get(docname)
+        if deps:
+            for dep in list(deps):
+                if os.path.normpath(os.path.join(env.srcdir, dep)) in macrofiles:
+                    deps.discard(dep)
+
+
+def init_parser_cache(app):
+    '''
+    start each build with an empty parser cache
+    
+    The reST cache is keyed by content, so its entries are kept.
+    In a parallel build (``sphinx-build -j N``), each process
+    that reads documents has its own copy of the caches.
+    '''
+    parser_cache.clear()
+    parser_cache.max_entries = app.config.autospecmacro_parser_cache_size
+    rest_cache.hits = rest_cache.misses = 0
+    rest_cache.max_entries = app.config.autospecmacro_parser_cache_size
+
+
+def report_parser_cache(app, exception):
+    '''report how often the parser cache was used (by the main process)'''
+    verbose = app.verbose if logger is None else logger.verbose
+    verbose('specdomain parser cache: %d hits, %d misses', 
+            parser_cache.hits, parser_cache.misses)
+    verbose('specdomain reST cache: %d hits, %d misses', 
+            rest_cache.hits, rest_cache.misses)
 
 
 # http://sphinx.pocoo.org/ext/tutorial.html#the-setup-function
@@ -459,4 +1040,27 @@ def setup(app):
     app.add_domain(SpecDomain)
     app.add_autodocumenter(SpecMacroDocumenter)
     app.add_autodocumenter(SpecDirDocumenter)
-    app.add_config_value('autospecmacrodir_process_subdirs', True, True)
+    app.add_directive('autospecmacro-nodes', SpecNodesDirective)
+    app.add_config_value('autospecmacrodir_process_subdirs', False, True)
+    app.add_config_value('autospecmacrodir_include', DEFAULT_INCLUDE, True)
+    app.add_config_value('autospecmacrodir_exclude', [], True)
+    app.add_config_value('autospecmacrodir_walk_workers', 1, '')
+    app.add_config_value('autospecmacrodir_pages', False, True)
+    app.add_config_value('autospecmacrodir_pages_dir', 'specmacro', True)
+    app.add_config_value('autospecmacro_cache', False, '')
+    app.add_config_value('autospecmacro_cache_dir', '', '')
+    app.add_config_value('autospecmacro_cache_size', 50*1024*1024, '')
+    app.add_config_value('autospecmacro_parser_cache_size', 100, '')
+    app.add_config_value('autospecmacro_stream_size', 10*1024*1024, '')
+    app.add_config_value('autospecmacro_parse_workers', 1, '')
+    app.add_config_value('autospecmacro_renderer', 'rest', '')
+    app.connect('builder-inited', init_parser_cache)
+    app.connect('builder-inited', generate_macrofile_pages)
+    app.connect('env-get-outdated', outdated_macrofile_docs)
+    app.connect('env-updated', drop_macrofile_dependencies)
+    app.connect('build-finished', report_parser_cache)
+    # (Sphinx before 1.3 ignores this)
+    return {
+        'parallel_read_safe': True,
+        'parallel_write_safe': True,
+    }
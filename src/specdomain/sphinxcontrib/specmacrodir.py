@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+"""
+    sphinxcontrib.specmacrodir
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    :synopsis: find the SPEC macro files in a directory tree
+
+    The directory entries are read with ``scandir()`` (Python 3.5+,
+    or the optional *scandir* package:  ``pip install sphinxcontrib-specdomain[scandir]``)
+    so that the type of most entries is known without a ``stat()`` call.
+    Otherwise, each entry is stat'ed once.  Only directories and symbolic
+    links are stat'ed with ``scandir()``.
+
+    :copyright: Copyright 2012-2014 by BCDA, Advanced Photon Source, Argonne National Laboratory
+    :license: ANL Open Source License, see LICENSE for details.
+"""
+
+import fnmatch
+import os
+import re
+import stat
+from multiprocessing.pool import ThreadPool
+
+try:
+    from os import scandir
+except ImportError:
+    try:
+        from scandir import scandir
+    except ImportError:
+        scandir = None      # use os.listdir() and os.stat()
+
+
+DEFAULT_INCLUDE = ['*.mac']
+
+
+def glob_matcher(patterns):
+    """
+    one compiled expression that matches any of the glob *patterns*
+
+    Returns a function of a name that returns True if it matches,
+    or None if there are no *patterns*.
+
+    :param [str] patterns: glob patterns, such as ``*.mac``
+    """
+    if isinstance(patterns, basestring):
+        patterns = [item.strip() for item in patterns.split(',')]
+    patterns = [item for item in patterns if item]
+    if len(patterns) == 0:
+        return None
+    regexp = re.compile('|'.join(['(?:%s)' % fnmatch.translate(item) for item in patterns]))
+    return lambda name: regexp.match(name) is not None
+
+
+class SpecMacroDirWalker:
+    """
+    Find the SPEC macro files in a directory and (optionally) its subdirectories
+
+    A file (or directory) reached more than once, such as through
+    a symbolic link, is found only the first time.  The glob patterns
+    are matched against the path of each file relative to the top
+    directory, with ``/`` separators, so ``*.mac`` finds macro files
+    at any depth and ``old/*`` excludes all from subdirectory *old*.
+    A directory whose relative path matches *exclude* is not read.
+
+    :param bool subdirs: also look in subdirectories
+    :param [str] include: glob patterns of the files to find
+    :param [str] exclude: glob patterns of the files and directories to skip
+    :param int workers: number of threads reading directories at once
+        (on a network file system, each directory read waits on the server)
+    """
+
+    def __init__(self, subdirs = True, include = DEFAULT_INCLUDE, exclude = (), workers = 1):
+        self.subdirs = subdirs
+        self.include = glob_matcher(include) or (lambda name: False)
+        self.exclude = glob_matcher(exclude) or (lambda name: False)
+        self.workers = workers
+
+    def walk(self, topdir):
+        """
+        return the sorted list of SPEC macro files (with *topdir* as their path)
+
+        Files in a directory come before those in its subdirectories.
+
+        :param str topdir: name (with optional path) of the directory
+        """
+        st = _stat(topdir)
+        if st is None or not stat.S_ISDIR(st.st_mode):
+            return []
+        seen = set([(st.st_dev, st.st_ino)])      # files and directories found so far
+        listings = {}                               # relative path: (files, subdirectories)
+        level = [('', st.st_dev)]
+        pool = None
+        if self.workers > 1:
+            pool = ThreadPool(self.workers)
+        try:
+            while len(level) > 0:
+                if pool is None or len(level) == 1:
+                    scans = [self.scan(topdir, reldir, dev) for reldir, dev in level]
+                else:
+                    scans = pool.map(lambda args: self.scan(topdir, *args), level)
+                next_level = []
+                for (reldir, dev), (files, subdirs) in zip(level, scans):     #@UnusedVariable
+                    # decide here, in the same order every time, which is found first
+                    files = [name for name, key in files if _first(seen, key)]
+                    subdirs = [(name, key) for name, key in subdirs if _first(seen, key)]
+                    listings[reldir] = (files, [name for name, key in subdirs])
+                    next_level += [(_join(reldir, name), _device(key)) for name, key in subdirs]
+                level = next_level
+        finally:
+            if pool is not None:
+                pool.close()
+        macrofiles = []
+        self._collect(topdir, '', listings, macrofiles)
+        return macrofiles
+
+    def scan(self, topdir, reldir, dev):
+        """
+        read one directory:  (files, subdirectories), sorted by name
+
+        Each is a list of (name, (device, inode)).  Unreadable entries are skipped.
+
+        :param str topdir: the top directory
+        :param str reldir: path of this directory relative to *topdir*
+        :param int dev: device of this directory (None if not known)
+        """
+        path = os.path.join(topdir, *reldir.split('/')) if reldir else topdir
+        files, subdirs = [], []
+        for name, is_dir, is_file, key in _entries(path, dev):
+            relname = _join(reldir, name)
+            if self.exclude(relname):
+                continue
+            if is_dir:
+                if self.subdirs:
+                    subdirs.append((name, key))
+            elif is_file and self.include(relname):
+                files.append((name, key))
+        files.sort()
+        subdirs.sort()
+        return files, subdirs
+
+    def _collect(self, topdir, reldir, listings, macrofiles):
+        files, subdirs = listings[reldir]
+        path = os.path.join(topdir, *reldir.split('/')) if reldir else topdir
+        macrofiles += [os.path.join(path, name) for name in files]
+        for name in subdirs:
+            self._collect(topdir, _join(reldir, name), listings, macrofiles)
+
+
+def _entries(path, dev):
+    """(name, is directory, is file, (device, inode)) of each entry in *path*"""
+    if scandir is not None:
+        try:
+            entries = list(scandir(path))
+        except OSError:
+            return
+        for entry in entries:
+            try:
+                if entry.is_symlink():
+                    st = os.stat(entry.path)        # where it points
+                    yield entry.name, stat.S_ISDIR(st.st_mode), stat.S_ISREG(st.st_mode), \
+                        _key(entry.path, st.st_dev, st.st_ino)
+                elif entry.is_dir():
+                    st = entry.stat()               # may be a mount point, another device
+                    yield entry.name, True, False, _key(entry.path, st.st_dev, st.st_ino)
+                else:
+                    # same device as its directory, inode from the directory entry
+                    yield entry.name, False, entry.is_file(), _key(entry.path, dev, entry.inode())
+            except OSError:
+                continue                            # dangling link, or removed
+    else:
+        try:
+            names = os.listdir(path)
+        except OSError:
+            return
+        for name in names:
+            filename = os.path.join(path, name)
+            try:
+                st = os.stat(filename)
+            except OSError:
+                continue
+            yield name, stat.S_ISDIR(st.st_mode), stat.S_ISREG(st.st_mode), \
+                _key(filename, st.st_dev, st.st_ino)
+
+
+def _key(path, dev, ino):
+    """identifies the file:  (device, inode), or its real path where there are no inodes"""
+    if ino:
+        return (dev, ino)
+    return os.path.realpath(path)
+
+
+def _device(key):
+    if isinstance(key, tuple):
+        return key[0]
+    return None
+
+
+def _first(seen, key):
+    """is this the first time *key* is seen?"""
+    if key in seen:
+        return False
+    seen.add(key)
+    return True
+
+
+def _join(reldir, name):
+    if reldir:
+        return reldir + '/' + name
+    return name
+
+
+def _stat(path):
+    try:
+        return os.stat(path)
+    except OSError:
+        return None
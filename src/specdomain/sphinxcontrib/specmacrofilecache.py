@@ -0,0 +1,305 @@
+# -*- coding: utf-8 -*-
+"""
+    sphinxcontrib.specmacrofilecache
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    :synopsis: caches of SPEC macro file parser results
+
+    The results of parsing a SPEC macro file depend only on
+    the content of the file and on the version of the parser.
+    Keep them, so that unchanged files need not be parsed again.
+
+    :copyright: Copyright 2012-2014 by BCDA, Advanced Photon Source, Argonne National Laboratory
+    :license: ANL Open Source License, see LICENSE for details.
+"""
+
+import copy
+import hashlib
+import os
+import tempfile
+from collections import OrderedDict
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+from specmacrofileparser import PARSER_VERSION, SpecMacrofileParser
+
+
+class SpecDiskCache:
+    """
+    Cache of parser findings, kept on disk, one file per macro file content
+
+    Each entry is named by the content hash of the macro file and
+    the version of the parser, so entries from an older parser are
+    never used (they are evicted, as are any other entries that have
+    not been used recently, when the cache grows beyond *max_size*).
+
+    Entries are written to a temporary file, then renamed, so that
+    concurrent builds sharing the same directory never read
+    a partially-written entry.
+
+    The total size of the cache files is found once, then kept up
+    to date as entries are written.  The directory is scanned again
+    only when that total grows beyond *max_size*, and then entries
+    are evicted down to *low_water* of it, so that the next few puts
+    need no scan.
+
+    :param str directory: where to keep the cache files (created as needed)
+    :param int max_size: total size (bytes) of the cache files
+    """
+
+    suffix = '.pickle'
+    low_water = 0.9
+
+    def __init__(self, directory, max_size = 50*1024*1024):
+        self.directory = directory
+        self.max_size = max_size
+        self.size = None        # total size of the cache files, once known
+
+    def filename(self, digest):
+        """name of the cache file for content with this hash"""
+        name = '%s-v%s%s' % (digest, PARSER_VERSION, self.suffix)
+        return os.path.join(self.directory, name)
+
+    def get(self, digest):
+        """
+        return the findings for content with this hash, or None if not cached
+
+        :param str digest: content hash of the macro file
+        """
+        filename = self.filename(digest)
+        try:
+            with open(filename, 'rb') as f:
+                findings = pickle.load(f)
+        except Exception:
+            return None     # not cached, or not readable: parse again
+        try:
+            os.utime(filename, None)        # recently used
+        except OSError:
+            pass
+        return findings
+
+    def put(self, digest, findings):
+        """
+        save the findings for content with this hash
+
+        :param str digest: content hash of the macro file
+        :param [dict] findings: what the parser found in that content
+        """
+        try:
+            if not os.path.exists(self.directory):
+                os.makedirs(self.directory)
+        except OSError:
+            pass            # created by a concurrent build
+        try:
+            fd, tempname = tempfile.mkstemp(suffix='.tmp', dir=self.directory)
+        except OSError:
+            return          # cannot write here: do without the cache
+        if self.size is None:
+            self.size = self._entries()[1]
+        filename = self.filename(digest)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(findings, f, pickle.HIGHEST_PROTOCOL)
+            size = os.path.getsize(tempname)
+            if os.path.exists(filename):
+                size -= os.path.getsize(filename)   # replaced
+            os.rename(tempname, filename)
+        except (OSError, IOError):
+            if os.path.exists(tempname):
+                os.remove(tempname)
+            return
+        self.size += size
+        if self.size > self.max_size:
+            self.evict()
+
+    def _entries(self):
+        """list the cache files as (mtime, size, filename), and their total size"""
+        entries = []
+        total = 0
+        for name in os.listdir(self.directory):
+            if name.endswith(self.suffix):
+                filename = os.path.join(self.directory, name)
+                try:
+                    st = os.stat(filename)
+                except OSError:
+                    continue        # removed by a concurrent build
+                entries.append((st.st_mtime, st.st_size, filename))
+                total += st.st_size
+        return entries, total
+
+    def evict(self):
+        """remove the least recently used entries until the cache fits in max_size"""
+        entries, total = self._entries()
+        if total <= self.max_size:
+            self.size = total
+            return
+        entries.sort()
+        for mtime, size, filename in entries:       #@UnusedVariable
+            if total <= self.low_water*self.max_size:
+                break
+            try:
+                os.remove(filename)
+            except OSError:
+                pass
+            total -= size
+        self.size = total
+
+
+class SpecParserCache:
+    """
+    Parsers of the macro files read during one build, most recently used last
+
+    A macro file is parsed again only when its modification time
+    or size has changed.  At most *max_entries* parsers are kept.
+
+    :param int max_entries: number of parsers to keep
+    """
+
+    def __init__(self, max_entries = 100):
+        self.max_entries = max_entries
+        self.parsers = OrderedDict()    # absolute path: ((mtime, size), parser)
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.parsers)
+
+    def clear(self):
+        """forget all parsers and reset the counters"""
+        self.parsers.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def parser(self, macrofile, cache = None):
+        """
+        return a :class:`SpecMacrofileParser` for *macrofile*
+
+        :param str macrofile: name (with optional path) of SPEC macro file
+        :param obj cache: (optional) on-disk cache used when the file must be parsed
+        """
+        key = os.path.abspath(macrofile)
+        stamp = _stamp(key)
+        entry = self.parsers.pop(key, None)
+        if entry is not None and stamp is not None and entry[0] == stamp:
+            self.hits += 1
+            parser = entry[1]
+        else:
+            self.misses += 1
+            parser = SpecMacrofileParser(macrofile, cache=cache)
+        self._keep(key, stamp, parser)
+        if parser.filename != macrofile:
+            # same file, named by another path
+            parser = copy.copy(parser)
+            parser.filename = macrofile
+        return parser
+    
+    def prefetch(self, macrofiles, cache = None, workers = None):
+        """
+        parse those of *macrofiles* not already kept, in parallel processes
+        
+        :param [str] macrofiles: names (with optional paths) of SPEC macro files
+        :param obj cache: (optional) on-disk cache used when a file must be parsed
+        :param int workers: number of processes (default: one per CPU)
+        """
+        stale = []
+        for macrofile in macrofiles:
+            key = os.path.abspath(macrofile)
+            stamp = _stamp(key)
+            entry = self.parsers.get(key)
+            if stamp is not None and (entry is None or entry[0] != stamp):
+                stale.append((key, stamp, macrofile))
+        parsers = SpecMacrofileParser.parse_many([macrofile for key, stamp, macrofile in stale], 
+                                                 workers=workers, cache=cache)
+        for (key, stamp, macrofile), parser in zip(stale, parsers):    #@UnusedVariable
+            self.misses += 1
+            self._keep(key, stamp, parser)
+    
+    def _keep(self, key, stamp, parser):
+        self.parsers.pop(key, None)
+        self.parsers[key] = (stamp, parser)
+        while len(self.parsers) > self.max_entries:
+            self.parsers.popitem(last=False)
+
+
+class SpecReSTCache:
+    """
+    reST rendered from macro files, most recently used last
+
+    Each entry is keyed by (content hash, renderer style, name of the
+    macro file as given), since the reST names the file.  At most
+    *max_entries* entries are kept in memory.  An entry is also kept
+    in the on-disk *cache* (such as :class:`SpecDiskCache`), when one
+    is given, so that later builds and other builders can use it.
+
+    :param int max_entries: number of entries to keep in memory
+    """
+
+    def __init__(self, max_entries = 100):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def clear(self):
+        """forget all entries (not those on disk) and reset the counters"""
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def has(self, key, cache = None):
+        """is there an entry for *key* (without reading it)?"""
+        if key in self.entries:
+            return True
+        return cache is not None and os.path.exists(cache.filename(_disk_key(key)))
+
+    def get(self, key, cache = None):
+        """
+        return the entry for *key*, or None if not cached
+
+        :param obj cache: (optional) on-disk cache to look in, if not in memory
+        """
+        value = self.entries.pop(key, None)
+        if value is None and cache is not None:
+            value = cache.get(_disk_key(key))
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._keep(key, value)
+        return value
+
+    def put(self, key, value, cache = None):
+        """
+        keep *value* as the entry for *key*
+
+        :param obj cache: (optional) on-disk cache to keep it in, too
+        """
+        self._keep(key, value)
+        if cache is not None:
+            cache.put(_disk_key(key), value)
+
+    def _keep(self, key, value):
+        self.entries.pop(key, None)
+        self.entries[key] = value
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+
+def _disk_key(key):
+    """name of the entry for the reST cache *key* in an on-disk cache"""
+    return 'rest-' + hashlib.sha1(repr(key)).hexdigest()
+
+
+def _stamp(filename):
+    """(modification time, size) of *filename*, or None if it cannot be found"""
+    try:
+        st = os.stat(filename)
+    except OSError:
+        return None
+    return (st.st_mtime, st.st_size)
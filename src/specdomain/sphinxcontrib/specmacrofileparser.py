@@ -18,13 +18,27 @@ code blocks in the SPEC macro source code file across multiple lines.
 :license: ANL Open Source License, see LICENSE for details.
 """
 
+import glob
+import hashlib
+import mmap
+import multiprocessing
 import os
 import re
+from array import array
+from bisect import bisect_left, bisect_right
+from functools import partial
+from itertools import groupby, islice
+from operator import attrgetter
 from pprint import pprint        #@UnusedImport
+from types import InstanceType
 
 #   http://www.txt2re.com/index-python.php3
 #  http://regexpal.com/
 
+# increase when a change to the parser changes its findings or their reST
+# (invalidates cached findings and reST)
+PARSER_VERSION = 8
+
 string_start                = r'^'
 string_end                  = r'$'
 match_all                   = r'.*'
@@ -43,66 +57,47 @@ non_greedy_filler_match     = r'(' + non_greedy_filler + r')'
 variable_name_match         = r'(@?' + macro_name + r'\[?\]?)'
 
 
-        
-extended_comment_block_sig_re = re.compile(
-                        string_start
-                        + non_greedy_whitespace
-                        + extended_comment_marker
-                        + r'(' + non_greedy_filler + r')'
-                        + extended_comment_marker
-                        + non_greedy_filler
-                        + string_end, 
-                        re.IGNORECASE|re.DOTALL|re.MULTILINE)
-
-variable_description_re = re.compile(
-                        string_start
-                        + non_greedy_filler
-                        + r'#:'
-                        + non_greedy_whitespace
-                        + r'(' + non_greedy_filler + r')'
-                        + non_greedy_whitespace
-                        + string_end, 
-                        re.IGNORECASE|re.DOTALL|re.MULTILINE)
-
-    
+# line-start patterns, matched once at the start of each line of SPEC code
 lgc_variable_sig_re = re.compile(
                         r''
-                        + string_start
-                        + non_greedy_whitespace
-                        + r'(local|global|constant)'        # 1: object type
                         + non_greedy_whitespace
-                        + r'(' + non_greedy_filler + r')'   # 2: too complicated to parse all at once
-                        + string_end
-                        , 
-                        re.DOTALL
-                        |re.MULTILINE
-                    )
-
-variable_name_re = re.compile(
-                        variable_name_match, 
-                        re.IGNORECASE|re.DOTALL|re.MULTILINE
+                        + r'(local|global|constant)\b'      # 1: object type
+                        + r'(.*)'                           # 2: too complicated to parse all at once
                         )
 
 arg_list_match = r'(\(' + non_greedy_filler + r'\))?'
 
 spec_macro_declaration_match_re = re.compile(
-                        string_start
-                        + r'\s*?'                           # optional blank space
+                        r'\s*?'                             # optional blank space
                         + r'(r?def)\s'                      # 1: def_type (rdef | def)
                         + non_greedy_whitespace
                         + macro_name_match                  # 2: macro_name
                         + arg_list_match                    # 3: optional arguments
                         + non_greedy_whitespace
-                        + r"[\\']+"                          # start body section
-                        + non_greedy_filler_match           # 4: body
-                        + r"[\\']+"                          # end body section
-                        + non_greedy_whitespace
-                        + r'(#.*?)?'                        # 5: optional comment
-                        + string_end
-                        , 
-                        re.IGNORECASE|re.DOTALL|re.MULTILINE)
+                        + r"(\\?')"                         # 4: start body section
+                        )
+
+# the end of a macro body:  closing quote(s), then only an optional comment
+# (in two parts, so that each run of quotes is matched only once)
+spec_macro_quotes_re = re.compile(r"(?:\\?')+")
+spec_macro_body_end_re = re.compile(r"\s*(#.*)?$")
 
+# tokens that change the state of the lexer inside SPEC code
+# (a # after $ is not a comment:  $# is the number of macro arguments)
+code_token_re = re.compile(r'\\.|"""|"|\'|(?<!\$)#|\bcdef\s*\(', re.DOTALL)
+cdef_token_re = re.compile(r'\\.|"""|"|\'|(?<!\$)#|\(|\)', re.DOTALL)
 
+# remainder of a double-quoted string, up to and including the closing quote
+string_end_re = re.compile(r'(?:[^"\\]|\\.)*"', re.DOTALL)
+string_literal_re = re.compile(r'"(?:[^"\\]|\\.)*"$', re.DOTALL)
+
+# tokens that matter when splitting the argument list of cdef( ... )
+cdef_arg_token_re = re.compile(r'\\.|"|(?<!\$)#.*|[(\[]|[)\]]|,')
+
+variable_name_re = re.compile(
+                        variable_name_match, 
+                        re.IGNORECASE|re.DOTALL|re.MULTILINE
+                        )
 
 args_match_re = re.compile(
                           r'\('
@@ -110,6 +105,708 @@ args_match_re = re.compile(
                         + r'\)', 
                         re.DOTALL)
 
+# names in SPEC code, with what follows each when it is given a value
+# (strings, comments, and extended comments are matched so they can be skipped)
+name_token_re = re.compile(
+                        r'"{3}[\s\S]*?(?:"{3}|\Z)'        # extended comment
+                        + r'|"(?:[^"\\\n]|\\.)*"?'         # string
+                        + r'|(?<!\$)#[^\n]*'                     # comment (not $#)
+                        + r'|(?<![\w$@])([a-zA-Z_]\w*)'       # 1: name
+                        + r'(\s*(?:\[[^\]\n]*\])?\s*(?:[-+*/%^|&]|<<|>>)?=(?!=))?'  # 2: assignment
+                        )
+
+# lexer states
+CODE, STRING, TRIPLE = range(3)
+
+# object types of def and rdef macro declarations
+macro_objtypes = ('def', 'rdef', 'function def', 'function rdef')
+
+
+class _SourceText(object):
+    """
+    a text field of a :class:`Finding` that may be kept as 
+    (start, end) offsets into the source buffer, until it is read
+    """
+    
+    def __init__(self, slot):
+        self.slot = slot
+    
+    def __get__(self, item, owner):
+        if item is None:
+            return self
+        value = getattr(item, self.slot)
+        if type(value) is tuple:
+            return item.source[value[0]:value[1]]
+        return value
+    
+    def __set__(self, item, value):
+        setattr(item, self.slot, value)
+
+
+class Finding(object):
+    """
+    Something found in a SPEC macro file:  a macro definition,
+    a variable declaration, or a comment
+    
+    The fields are attributes.  A field that is None is not set.
+    Names and object types are interned, so each distinct name is
+    kept in memory only once, however many items refer to it.
+    The *body*, *comment*, *text*, and *description* fields may be kept
+    as offsets into the *source* buffer:  the text is copied only when
+    it is read.
+    
+    For compatibility, a finding may also be used as a dictionary
+    of the fields that are set, such as ``item['name']``, 
+    ``item.get('description', '')``, or ``'summary' in item``.
+    """
+    
+    fields = ('start_line', 'end_line', 'objtype', 'name', 'parent', 
+              'args', 'body', 'comment', 'text', 'part', 'flags', 
+              'description', 'summary')
+    __slots__ = ('start_line', 'end_line', 'objtype', 'name', 'parent', 
+                 'args', '_body', '_comment', '_text', 'part', 'flags', 
+                 '_description', 'summary', 'source')
+    
+    body = _SourceText('_body')
+    comment = _SourceText('_comment')
+    text = _SourceText('_text')
+    description = _SourceText('_description')
+    
+    def __init__(self, start_line, end_line, objtype, name = None, parent = None, 
+                 args = None, body = None, comment = None, text = None, source = None):
+        self.start_line = start_line
+        self.end_line = end_line
+        self.objtype = _intern(objtype)
+        self.name = _intern(name)
+        self.parent = parent
+        self.args = args
+        self._body = body
+        self._comment = comment
+        self._text = text
+        self.part = None
+        self.flags = None
+        self._description = None
+        self.summary = None
+        self.source = source
+    
+    def __getitem__(self, key):
+        value = getattr(self, key, None)
+        if value is None:
+            raise KeyError(key)
+        return value
+    
+    def __setitem__(self, key, value):
+        if key not in self.fields:
+            raise KeyError(key)
+        if key in ('objtype', 'name', 'parent'):
+            value = _intern(value)
+        setattr(self, key, value)
+    
+    def __contains__(self, key):
+        return getattr(self, key, None) is not None
+    
+    def __iter__(self):
+        return iter(self.keys())
+    
+    def __len__(self):
+        return len(self.keys())
+    
+    def __repr__(self):
+        return 'Finding(%r)' % self.as_dict()
+    
+    def __getstate__(self):
+        # offsets are kept:  the source must be attached again (see attach())
+        return tuple([getattr(self, slot) for slot in self.__slots__[:-1]])
+    
+    def __setstate__(self, state):
+        for slot, value in zip(self.__slots__[:-1], state):
+            setattr(self, slot, value)
+        self.source = None
+    
+    def __copy__(self):
+        item = Finding.__new__(Finding)
+        for slot in self.__slots__:
+            setattr(item, slot, getattr(self, slot))
+        return item
+    
+    def __deepcopy__(self, memo):
+        return self.__copy__()          # all fields are immutable
+    
+    def attach(self, source):
+        """read the fields kept as offsets from *source* (the same content)"""
+        self.source = source
+    
+    def get(self, key, default = None):
+        value = getattr(self, key, None)
+        if value is None:
+            return default
+        return value
+    
+    def keys(self):
+        return [key for key in self.fields if getattr(self, key) is not None]
+    
+    def items(self):
+        return [(key, getattr(self, key)) for key in self.keys()]
+    
+    def update(self, fields):
+        for key, value in fields.items():
+            self[key] = value
+    
+    def as_dict(self):
+        """the fields that are set, as a dictionary"""
+        return dict(self.items())
+
+
+def _intern(text):
+    """the interned copy of *text*, if it is a (non-unicode) string"""
+    if type(text) is str:
+        return intern(text)
+    return text
+
+
+class SpecMacrofileLexer:
+    """
+    Scan the lines of a SPEC macro file once, in order, for
+    macro definitions, variable declarations, and comments.
+    
+    The lexer keeps track of double-quoted strings, ``#`` comments,
+    triple-quoted extended comments, and the quoted body of
+    *def* and *rdef* macros so that no structure is recognized
+    inside a string or a comment.  A macro body may contain
+    other macro definitions, quoted with ``\'``.
+    
+    Each item found is a :class:`Finding`, as returned
+    by the ``list_*()`` methods of :class:`SpecMacrofileParser`.
+    Items are produced in the order they start in the file.
+    
+    When the lines are read from a *source* buffer (the whole file),
+    the body of a macro, the text of an extended comment, and the comment
+    after a macro are kept as offsets into that buffer, not copied.
+    
+    :param obj source: (optional) buffer that holds the lines to be scanned
+    """
+    
+    def __init__(self, source = None):
+        self.source = source
+        self.offset = 0         # of the current line in the source
+        self.next_offset = 0    # of the next line in the source
+        self.linenumber = 0
+        self.state = CODE
+        self.opened = None      # open string or extended comment: (line, next_offset)
+        self.ready = []         # items complete and in file order
+        self.pending = []       # items waiting for an open def or cdef to end
+        self.macros = []        # open def or rdef: [item, capture, quote, next_offset]
+        self.cdef = None        # open cdef: [item, capture, nesting, next_offset]
+        self.comment = None     # open extended comment: [item, capture]
+        self.captured = []      # without a source: lines since the first open capture
+        self.quote_run = None   # (line, end, end of body match) of the last run of quotes
+    
+    def scan(self, lines, reread = None):
+        """
+        generator: yield the items found in *lines* (each ends with a newline)
+        
+        :param func reread: (optional) ``reread(linenumber)`` returns 
+            the lines after *linenumber* again, so that the scan can start 
+            again (once) after a structure that never ends (see :meth:`finish`)
+        """
+        ready = self.ready
+        while lines is not None:
+            for line in lines:
+                self.feed(line)
+                if len(ready) > 0:
+                    for item in ready:
+                        yield item
+                    del ready[:]
+            restart = self.finish(reread is not None)
+            for item in ready:
+                yield item
+            del ready[:]
+            lines = None
+            if restart is not None:
+                lines, reread = reread(restart), None
+    
+    def feed(self, line):
+        """scan the next line of the file"""
+        self.linenumber += 1
+        self.offset = self.next_offset
+        self.next_offset += len(line)
+        if self.source is None:
+            if len(self.macros) > 0 or self.cdef is not None or self.comment is not None:
+                self.captured.append(line)
+            else:
+                self.captured = [line]
+        if self.state == TRIPLE:
+            pos = line.find('"""')
+            if pos < 0:
+                return
+            self._end_triple(pos)
+            pos += 3
+        elif self.state == STRING:
+            mo = string_end_re.match(line)
+            if mo is None:
+                return
+            self.state = CODE
+            pos = mo.end()
+        else:
+            pos = self._line_start(line)
+        self._scan_code(line, pos)
+    
+    def finish(self, resync = False):
+        """
+        end of file: resolve anything still open
+        
+        A *parse warning* item is produced for each structure that never ends.
+        
+        If *resync* is True and a string, an extended comment, or a macro body
+        never ends, everything that starts after the first of these is dropped
+        and its line number is returned:  the scan should start again with 
+        the next line.  Otherwise, return None.
+        """
+        unclosed = []       # (start line, offset of the next line, what)
+        if self.state == TRIPLE:
+            unclosed.append(self.opened + ('extended comment (""")',))
+        elif self.state == STRING:
+            unclosed.append(self.opened + ('string (")',))
+        for macro in self.macros:
+            item = macro[0]
+            unclosed.append((item.start_line, macro[3], 'body of %s %s' % (item.objtype, item.name)))
+        restart = None
+        if resync and len(unclosed) > 0:
+            unclosed = [min(unclosed)]
+            restart, resume_offset = unclosed[0][:2]
+            if self.cdef is not None and self.cdef[0].start_line > restart:
+                self.cdef = None
+            self.pending = [item for item in self.pending if item.start_line <= restart]
+        if self.cdef is not None:
+            unclosed.append((self.cdef[0].start_line, self.cdef[3], 'cdef() argument list'))
+            # unbalanced parentheses: keep what was found
+            self._end_cdef(self._capture_text(self.cdef[1], None))
+        # any macro body still open was never a macro definition
+        self._drop_macros(0)
+        for linenumber, offset, what in unclosed:      #@UnusedVariable
+            self.ready.append(Finding(linenumber, self.linenumber, 'parse warning', 
+                                      text='%s does not end' % what))
+        self.ready.sort(key=attrgetter('start_line'))
+        self.comment = None
+        self.state = CODE
+        self.captured = []
+        self.quote_run = None
+        if restart is not None:
+            self.linenumber = restart
+            self.next_offset = resume_offset
+        return restart
+    
+    def _emit(self, item):
+        if len(self.macros) == 0 and self.cdef is None:
+            self.ready.append(item)
+        else:
+            self.pending.append(item)
+    
+    def _release(self):
+        if len(self.macros) == 0 and self.cdef is None:
+            self.ready.extend([item for item in self.pending if item.objtype is not None])
+            self.pending = []
+    
+    def _line_start(self, line):
+        """recognize declarations at the start of a line of code"""
+        mo = spec_macro_declaration_match_re.match(line)
+        if mo is not None and (len(self.macros) == 0 or mo.group(4) == "\\'"):
+            if self.cdef is not None:
+                # resynchronize: that cdef never ended
+                self._end_cdef(self._capture_text(self.cdef[1], 0), self.linenumber-1)
+            objtype = mo.group(1)
+            args = mo.group(3)
+            # TODO: What if args is multi-line?  flatten.  What if really long?
+            if args is not None:
+                if len(args)>2:
+                    m = args_match_re.search(args)
+                    if m is not None:
+                        objtype = 'function ' + objtype
+                        args = m.group(1)
+                elif args == '()':
+                    objtype = 'function ' + objtype
+            item = Finding(self.linenumber, None, objtype, mo.group(2), args=str(args), 
+                           source=self.source)
+            self.pending.append(item)
+            self.macros.append([item, self._start_capture(line, mo.end()), mo.group(4), 
+                                self.next_offset])
+            return mo.end()
+        mo = lgc_variable_sig_re.match(line)
+        if mo is not None:
+            for item in _declared_variables(mo.group(1), mo.group(2), self.linenumber):
+                self._emit(item)
+            return mo.end(1)
+        return 0
+    
+    def _scan_code(self, line, pos):
+        """follow the tokens in SPEC code, starting from *pos*"""
+        indent = None
+        while True:
+            if self.cdef is None:
+                mo = code_token_re.search(line, pos)
+            else:
+                mo = cdef_token_re.search(line, pos)
+            if mo is None:
+                return
+            token = mo.group()
+            pos = mo.end()
+            if token == '"':
+                mo = string_end_re.match(line, pos)
+                if mo is None:
+                    self.state = STRING
+                    self.opened = (self.linenumber, self.next_offset)
+                    return
+                pos = mo.end()
+            elif token == '#':
+                if line.startswith('#:', mo.start()):
+                    self._emit(Finding(self.linenumber, self.linenumber, 
+                                       'descriptive comment', 
+                                       text=line[pos+1:].rstrip()))
+                return
+            elif token in ("'", "\\'"):
+                pos = self._close_macro(line, mo.start(), token)
+            elif token[0] == '\\':                  # other escaped character
+                continue
+            elif token == '"""':
+                if indent is None:
+                    indent = len(line) - len(line.lstrip())
+                if mo.start() <= indent:
+                    item = Finding(self.linenumber, None, 'extended comment', source=self.source)
+                    self.comment = [item, self._start_capture(line, pos)]
+                self.state = TRIPLE
+                self.opened = (self.linenumber, self.next_offset)
+                end = line.find('"""', pos)
+                if end < 0:
+                    return
+                self._end_triple(end)
+                pos = end + 3
+            elif token == '(':
+                self.cdef[2] += 1
+            elif token == ')':
+                self.cdef[2] -= 1
+                if self.cdef[2] == 0:
+                    self._end_cdef(self._capture_text(self.cdef[1], mo.start()))
+            else:                                   # cdef(
+                item = Finding(self.linenumber, None, 'cdef')
+                self.pending.append(item)
+                self.cdef = [item, self._start_capture(line, pos), 1, self.next_offset]
+    
+    def _close_macro(self, line, pos, quote):
+        """
+        end the innermost macro body quoted by *quote* if this is its end
+        
+        :returns int: where to continue the scan of *line*
+        """
+        macros = self.macros
+        if len(macros) > 0 and macros[-1][2] == quote:
+            depth = len(macros) - 1
+        elif len(macros) > 0 and macros[0][2] == quote:
+            depth = 0           # only the outermost body may be quoted with '
+        else:
+            return pos + len(quote)
+        run = self.quote_run
+        if run is None or run[0] != self.linenumber or pos >= run[1]:
+            # match each run of quotes (and what follows it) only once
+            run_end = spec_macro_quotes_re.match(line, pos).end()
+            run = (self.linenumber, run_end, spec_macro_body_end_re.match(line, run_end))
+            self.quote_run = run
+        end = run[2]
+        if end is None:
+            return run[1]       # no quote in this run ends a body
+        if self.cdef is not None:
+            # resynchronize: that cdef never ended
+            self._end_cdef(self._capture_text(self.cdef[1], pos))
+        # resynchronize: any macros opened since never ended
+        self._drop_macros(depth+1)
+        item, capture = macros.pop()[:2]
+        item.end_line = self.linenumber
+        item.body = self._end_capture(capture, pos)
+        if end.group(1) is not None:
+            if self.source is None:
+                item.comment = end.group(1)
+            else:
+                item.comment = (self.offset + end.start(1), self.offset + end.end(1))
+        self._release()
+        return pos + len(quote)
+    
+    def _drop_macros(self, depth):
+        """forget the macro definitions opened at or beyond *depth*"""
+        for macro in self.macros[depth:]:
+            macro[0].objtype = None
+        del self.macros[depth:]
+        self._release()
+    
+    def _end_triple(self, pos):
+        self.state = CODE
+        if self.comment is not None:
+            item = self.comment[0]
+            item.end_line = self.linenumber
+            item.text = self._end_capture(self.comment[1], pos)
+            self.comment = None
+            self._emit(item)
+    
+    def _start_capture(self, line, pos):
+        """begin capturing text at *pos* in the current *line*"""
+        if self.source is None:
+            return (len(self.captured) - 1, pos)
+        return self.offset + pos
+    
+    def _end_capture(self, capture, pos):
+        """
+        end the capture at *pos* in the current line (None: all of it)
+        
+        :returns: the text captured, or its (start, end) offsets in the source
+        """
+        if self.source is not None:
+            if pos is None:
+                return (capture, self.next_offset)
+            return (capture, self.offset + pos)
+        first, start = capture
+        lines = self.captured
+        if first == len(lines) - 1:
+            return lines[first][start:pos]
+        parts = [lines[first][start:]]
+        parts.extend(lines[first+1:-1])
+        parts.append(lines[-1][:pos])
+        return ''.join(parts)
+    
+    def _capture_text(self, capture, pos):
+        """end the capture at *pos* in the current line and return its text"""
+        span = self._end_capture(capture, pos)
+        if self.source is None:
+            return span
+        return self.source[span[0]:span[1]]
+    
+    def _end_cdef(self, text, end_line = None):
+        item = self.cdef[0]
+        item.end_line = end_line or self.linenumber
+        item.update(cdef_fields(parse_cdef_args(text)))
+        self.cdef = None
+        self._release()
+
+
+def parse_cdef_args(text):
+    """
+    split the argument list of a cdef() call into its arguments
+    
+    One pass through *text*:  commas inside double-quoted strings,
+    comments, or nested parentheses or brackets do not separate
+    arguments.  Comments are removed.
+    
+    :param str text: everything between the parentheses of ``cdef( ... )``
+    :returns [str]: each argument, stripped of surrounding blank space
+    """
+    args = []
+    parts = []
+    depth = 0
+    pos = start = 0
+    while True:
+        mo = cdef_arg_token_re.search(text, pos)
+        if mo is None:
+            break
+        token = mo.group()
+        pos = mo.end()
+        if token == '"':
+            mo = string_end_re.match(text, pos)
+            if mo is None:
+                break                           # unterminated string
+            pos = mo.end()
+        elif token[0] == '#':
+            parts.append(text[start:mo.start()])
+            start = pos
+        elif token in ('(', '['):
+            depth += 1
+        elif token in (')', ']'):
+            depth -= 1
+        elif token == ',' and depth == 0:
+            parts.append(text[start:mo.start()])
+            args.append(''.join(parts).strip())
+            parts = []
+            start = pos
+    parts.append(text[start:])
+    last = ''.join(parts).strip()
+    if len(args) > 0 or len(last) > 0:
+        args.append(last)
+    return args
+
+
+def cdef_fields(args):
+    """
+    describe a cdef() call from its arguments (see :func:`parse_cdef_args`)
+    
+    ``cdef("name", "body", "part", flags)``:  only the name is required.
+    String arguments are given without their quotes, other
+    arguments (such as ``0x20`` or ``sprintf(...)``) as written.
+    
+    :param [str] args: the arguments of the cdef() call
+    :returns {str,str}: name, args, body, part, and flags
+    """
+    fields = [unquote(arg) for arg in args[:4]]
+    fields += [None]*(4 - len(fields))
+    name, body, part, flags = fields
+    if name is None or len(name) == 0:
+        name = '<empty name>'
+    return {
+            'name':     name,
+            'args':     ', '.join(args[1:]),
+            'body':     body,
+            'part':     part,
+            'flags':    flags,
+            }
+
+
+def unquote(arg):
+    """the content of *arg* if it is a double-quoted string, otherwise *arg*"""
+    if string_literal_re.match(arg) is not None:
+        return arg[1:-1]
+    return arg
+
+
+def _declared_variables(objtype, content, linenumber):
+    """list the variables named in a local, global, or constant declaration"""
+    items = []
+    p = content.find('#')
+    if p >= 0:                                      # strip off any comment
+        content = content[:p]
+    content = re.sub('[,;]', ' ', content)          # replace , or ; with blank space
+    if content.find('[') >= 0:
+        content = re.sub('\s*?\[', '[', content)    # remove blank space before [
+    if objtype in ('constant'):
+        names = content.split()[:1]
+    else:
+        names = [var.group(1) for var in variable_name_re.finditer(content)]
+    for name in names:
+        if len(name) > 0:
+            items.append(Finding(linenumber, linenumber, objtype, name))
+    return items
+
+
+def map_file(filename):
+    """
+    return the content of *filename* as a read-only memory map
+    
+    The map is searched and sliced like a string, but the file is
+    not copied into memory:  only the slices taken from it are.
+    An empty file (which cannot be mapped) is read as a string.
+    The map (and an open file descriptor) is kept while any finding
+    that refers to it (see :class:`Finding`) is kept.
+    """
+    with open(filename, 'rb') as f:
+        try:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, EnvironmentError):
+            return f.read()
+
+
+def file_digest(filename, blocksize = 1024*1024):
+    """
+    SHA-1 digest (hexadecimal) of the content of *filename*,
+    as :meth:`SpecMacrofileParser.content_hash`, read a block at a time
+    """
+    digest = hashlib.sha1()
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(blocksize), ''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def make_line_offsets(buf):
+    """
+    return the offset of the start of each line in *buf*
+    
+    The table is an ``array`` of integers, one per line, in increasing order,
+    so that the line holding any position in *buf* can be found by bisection.
+    """
+    offsets = array('l', [0])
+    append = offsets.append
+    find = buf.find
+    size = len(buf)
+    pos = find('\n') + 1
+    while 0 < pos < size:
+        append(pos)
+        pos = find('\n', pos) + 1
+    return offsets
+
+
+class SpecFindingsIndex:
+    """
+    Items found in a macro file, sorted by their start line.
+    
+    Items within a span of lines are found by bisection
+    of the (compact) table of start lines.
+    """
+    
+    def __init__(self, items):
+        self.items = sorted(items, key=attrgetter('start_line'))
+        self.start_lines = array('l', [item.start_line for item in self.items])
+        self.by_objtype = {}    # objtype: (start lines, items) of that objtype
+    
+    def __len__(self):
+        return len(self.items)
+    
+    def lines(self):
+        """generator: (linenumber, [items]) for each line where any items start"""
+        for linenumber, items in groupby(self.items, key=attrgetter('start_line')):
+            yield linenumber, list(items)
+    
+    def within(self, first, last):
+        """list the items that start on lines *first* through *last*"""
+        start_lines = self.start_lines
+        return self.items[bisect_left(start_lines, first):bisect_right(start_lines, last)]
+    
+    def last_within(self, first, last, objtype):
+        """the last item of *objtype* that starts on lines *first* through *last* (or None)"""
+        if objtype not in self.by_objtype:
+            items = [item for item in self.items if item.objtype == objtype]
+            self.by_objtype[objtype] = (array('l', [item.start_line for item in items]), items)
+        start_lines, items = self.by_objtype[objtype]
+        i = bisect_right(start_lines, last)
+        if i > 0 and start_lines[i-1] >= first:
+            return items[i-1]
+        return None
+    
+    def assign_parents(self):
+        """
+        set the parent of every item to the name of the innermost def 
+        or rdef macro that contains it, in one sweep through the items
+        """
+        enclosing = []          # [first, last, name] lines of the children of each open macro
+        for item in self.items:
+            start = item.start_line
+            while len(enclosing) > 0 and enclosing[-1][1] < start:
+                enclosing.pop()
+            for first, last, name in reversed(enclosing):     #@UnusedVariable
+                if first <= start:
+                    item.parent = name
+                    break
+            if item.objtype in macro_objtypes:
+                enclosing.append([start+1, item.end_line-2, item.name])
+
+
+def _blocks(items):
+    """
+    generator: group the *items* (in start order) so that each macro definition
+    is in the same group as all the items that start within its lines, and
+    items that start on the same line are in the same group
+    """
+    block = []
+    last = None
+    for item in items:
+        if last is not None and item.start_line > last:
+            yield block
+            block = []
+            last = None
+        block.append(item)
+        if item.objtype in macro_objtypes:
+            end = item.end_line
+        else:
+            end = item.start_line
+        if last is None or end > last:
+            last = end
+    if len(block) > 0:
+        yield block
+
+
 class SpecMacrofileParser:
     '''
     Parse a SPEC macro file for macro definitions, 
@@ -122,7 +819,9 @@ class SpecMacrofileParser:
     
     Assume macro definitions are not nested (but test for this).
     
-    Assume macro files are small enough to load completely in memory.
+    Assume macro files are small enough to load completely in memory,
+    unless *stream* is True:  then the file is parsed incrementally,
+    each time its findings are needed (see :meth:`iter_findings`).
         
     An additional step would be to parse for:
     * def
@@ -133,14 +832,40 @@ class SpecMacrofileParser:
     * constant
     * array
     * ...
+    
+    :param str macrofile: name (with optional path) of SPEC macro file
+    :param obj cache: (optional) keeps the findings by content hash,
+        such as :class:`~sphinxcontrib.specmacrofilecache.SpecDiskCache`
+    :param bool stream: (optional) do not load the file into memory
     '''
     
-    def __init__(self, macrofile):
+    def __init__(self, macrofile, cache = None, stream = False):
         self.buf = None
+        self.digest = None
         self.findings = []
+        self.warnings = []      # parse warning findings
+        self.hidden = []        # macros and variables not documented (names that start with '_'), not kept in stream mode
         self.filename = None
+        if stream:
+            if not os.path.exists(macrofile):
+                raise RuntimeError, "file not found: " + macrofile
+            self.filename = macrofile
+            return
         self.read(macrofile)
-        self.parse_macro_file()
+        entry = None
+        if cache is not None:
+            entry = cache.get(self.content_hash())
+        if entry is None:
+            self.parse_macro_file()
+            if cache is not None:
+                cache.put(self.content_hash(), (self.findings, self.hidden))
+        else:
+            findings, hidden = entry
+            for item in findings + hidden:
+                item.attach(self.buf)
+            self.findings = findings
+            self.hidden = hidden
+            self.warnings = [item for item in findings if item.objtype == 'parse warning']
         self.description = ''
         self.clear_description = False
         self.found_first_global_extended_comment = False
@@ -148,7 +873,10 @@ class SpecMacrofileParser:
     def read(self, macrofile):
         """
         load the SPEC macro source code file into an internal buffer (self.buf).
-        Also remember the start and end position of each line (self.line_positions).
+        Also remember the start position of each line (self.line_offsets).
+        
+        The buffer is a read-only memory map of the file, where possible
+        (see :func:`map_file`).
         
         :param str filename: name (with optional path) of SPEC macro file
             (The path is relative to the ``.rst`` document.)
@@ -156,15 +884,74 @@ class SpecMacrofileParser:
         if not os.path.exists(macrofile):
             raise RuntimeError, "file not found: " + macrofile
         self.filename = macrofile
-        buf = open(macrofile, 'r').readlines()
-        offset = 0
-        lines = []
-        for linenumber, line in enumerate(buf):
-            end = offset+len(line)
-            lines.append([linenumber+1, offset, end])
-            offset = end
-        self.buf = ''.join(buf)
-        self.line_positions = lines
+        self.buf = map_file(macrofile)
+        self.digest = None
+        self.line_offsets = make_line_offsets(self.buf)
+    
+    def content_hash(self):
+        """SHA-1 digest (hexadecimal) of the internal buffer"""
+        if self.digest is None:
+            self.digest = hashlib.sha1(self.buf).hexdigest()
+        return self.digest
+    
+    def __getstate__(self):
+        # the file is not pickled:  it is read again when unpickled
+        if self.buf is not None:
+            self.content_hash()
+        state = self.__dict__.copy()
+        state['buf'] = None
+        state.pop('line_offsets', None)
+        return state
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.digest is None:
+            return                  # stream mode:  nothing was read
+        self.read(self.filename)
+        if self.content_hash() != state['digest']:
+            self.parse_macro_file() # changed since it was parsed
+        else:
+            for item in self.findings + self.hidden:
+                item.attach(self.buf)
+    
+    def __copy__(self):
+        # share the buffer (unlike pickle)
+        return InstanceType(SpecMacrofileParser, self.__dict__.copy())
+    
+    @staticmethod
+    def parse_many(macrofiles, workers = None, chunksize = None, cache = None):
+        """
+        parse many SPEC macro files, in parallel processes
+        
+        The parsers are pickled to return them from the worker processes:
+        only the findings are pickled, with offsets into the file in place
+        of the text, and the file is mapped again (and parsed again, if its
+        content has changed) here.
+        
+        :param [str] macrofiles: names (with optional paths) of SPEC macro files,
+            or the name of a directory with SPEC macro files (``*.mac``)
+        :param int workers: number of processes (default: one per CPU)
+        :param int chunksize: number of files given to a process at a time
+            (default: chosen by :meth:`multiprocessing.Pool.map`)
+        :param obj cache: (optional) keeps the findings by content hash,
+            such as :class:`~sphinxcontrib.specmacrofilecache.SpecDiskCache`
+        :returns [SpecMacrofileParser]: a parser for each file, in the same order
+        """
+        if isinstance(macrofiles, basestring):
+            macrofiles = sorted(glob.glob(os.path.join(macrofiles, '*.mac')))
+        parse = partial(SpecMacrofileParser, cache=cache)
+        if workers is None:
+            workers = multiprocessing.cpu_count()
+        workers = min(workers, len(macrofiles))
+        if workers < 2:
+            return map(parse, macrofiles)
+        pool = multiprocessing.Pool(workers)
+        try:
+            parsers = pool.map(parse, macrofiles, chunksize)
+        finally:
+            pool.terminate()
+            pool.join()
+        return parsers
     
     def std_read(self, macrofile):
         """
@@ -183,11 +970,42 @@ class SpecMacrofileParser:
         Figure out what can be documented in the file's contents (in self.buf)
         
             each of the list_something() methods returns a 
-            list of dictionaries where each dictionary 
-            has the keys: objtype, start_line, end_line, and others
+            list of findings (:class:`Finding`) where each finding 
+            has the fields: objtype, start_line, end_line, and others
         """
-        db = self._make_db()        # first, the file parsing
+        self.findings = list(self._analyze(self.scan()))
+    
+    def iter_findings(self):
+        """
+        generator: what can be documented in the file, in file order
         
+        A parser made with ``stream=True`` reads the file incrementally,
+        so that only the findings of one top-level structure (such as
+        a def macro and everything within it) are held at a time.
+        Otherwise, the findings already parsed are produced.
+        """
+        if self.buf is not None:
+            for item in self.findings:
+                yield item
+            return
+        with open(self.filename, 'r') as f:
+            for item in self._analyze(SpecMacrofileLexer().scan(f, self._reread)):
+                yield item
+    
+    def _reread(self, linenumber):
+        """generator: the lines of the file after *linenumber*, read again"""
+        with open(self.filename, 'r') as f:
+            for line in islice(f, linenumber, None):
+                yield line
+    
+    def _analyze(self, items):
+        """
+        generator: analyze the *items* from the lexer, in file order
+        
+        The items are analyzed in blocks:  a macro definition together with
+        everything that starts within its lines, or the items that start 
+        on one line outside of any macro definition.
+        """
         # Build a dict with objecttype for keys and methods for values
         # each method handles that particular spec macro file structure
         handler_method = {
@@ -200,6 +1018,7 @@ class SpecMacrofileParser:
             'function rdef': self.handle_def,
             'global': self.handle_other,
             'local': self.handle_other,
+            'parse warning': self.handle_warning,
             'rdef': self.handle_def,
         }
         process_first_list = ('descriptive comment', )
@@ -208,90 +1027,106 @@ class SpecMacrofileParser:
         # proceed line-by-line in order
         # TODO: could override this rule with a sort-order option
         self.findings = []
+        self.warnings = []
+        self.hidden = []
         self.description = ''
         self.clear_description = False
         self.found_first_global_extended_comment = False
-        for linenumber in sorted(db.keys()):
-            # Diagnostic line for development only
-            #print linenumber, ':', ' '.join(['<%s>' % d['objtype'] for d in db[linenumber]])
-            
-            # process any descriptive comment first
-            for item in db[linenumber]:
-                if item['objtype'] in process_first_list:
-                    handler_method[item['objtype']](item, db)
-            # now process the others
-            for item in db[linenumber]:
-                if item['objtype'] not in process_first_list:
-                    if 'function rdef' == item['objtype']:
-                        pass
-                    handler_method[item['objtype']](item, db)
-            
-            if self.clear_description:
-                self.description, self.clear_description = '', False
+        for block in _blocks(items):
+            db = SpecFindingsIndex(block)
+            db.assign_parents()
+            for linenumber, items in db.lines():     #@UnusedVariable
+                # Diagnostic line for development only
+                #print linenumber, ':', ' '.join(['<%s>' % d.objtype for d in items])
+                
+                # process any descriptive comment first
+                for item in items:
+                    if item.objtype in process_first_list:
+                        handler_method[item.objtype](item, db)
+                # now process the others
+                for item in items:
+                    if item.objtype not in process_first_list:
+                        handler_method[item.objtype](item, db)
+                
+                if self.clear_description:
+                    self.description, self.clear_description = '', False
+            for item in self.findings:
+                yield item
+            self.findings = []
+            if self.buf is None:
+                self.hidden = []        # stream mode:  hold only one block
     
     def _make_db(self):
-        """build the db dict by parsing for each type of structure"""
-        db = {}
-        # first, the file parsing
-        for func in (self.list_def_macros, 
-                     self.list_cdef_macros,
-                     self.list_variables,
-                     self.list_extended_comments,
-                     self.list_descriptive_comments,
-                     ):
-            for item in func():
-                s = item['start_line']
-                if s not in db.keys():
-                    db[s] = []
-                db[s].append(item)
-        return db
+        """build the db index by parsing for each type of structure"""
+        # first, the file parsing:  one pass through the buffer
+        return SpecFindingsIndex(self.scan())
+
+    def scan(self):
+        """
+        generator: single pass through the internal buffer for all structures
+        
+        Items are produced in the order they start in the file.
+        See :class:`SpecMacrofileLexer` for details.
+        """
+        return SpecMacrofileLexer(self.buf).scan(self.iter_lines(), self.iter_lines)
+
+    def iter_lines(self, after = 0):
+        """generator: each line of the internal buffer (after line *after*), with its newline"""
+        buf = self.buf
+        offsets = self.line_offsets
+        for i in xrange(after+1, len(offsets)):
+            yield buf[offsets[i-1]:offsets[i]]
+        if len(buf) > 0 and after < len(offsets):
+            yield buf[offsets[-1]:]
 
     def handle_def(self, node, db):
         """document SPEC def structures"""
-        # identify all the children of this node
-        parent = node['name']
-        self.found_first_local_extended_comment = False
-        if node.get('comment') is not None:
-            node['description'] = node.get('comment').lstrip('#:').strip()
+        # the children of this node already know their parent (db.assign_parents)
+        if node.comment is not None:
+            node.description = node.comment.lstrip('#:').strip()
         if len(self.description)>0:
-            node['description'] = self.description
-        for row in xrange(node['start_line']+1, node['end_line']-1):
-            if row in db.keys():
-                for item in db[row]:
-                    item['parent'] = parent
-                    if item['objtype'] == 'extended comment':
-                        if not self.found_first_local_extended_comment:
-                            # TODO: could override this rule with an option
-                            node['description'] = item['text']
-                            self.found_first_local_extended_comment = False
-        if not node['name'].startswith('_'):
+            node.description = self.description
+        # TODO: could override this rule with an option
+        item = db.last_within(node.start_line+1, node.end_line-2, 'extended comment')
+        if item is not None:
+            node.description = item._text     # without copying the text
+        if not node.name.startswith('_'):
             # TODO: could override this rule with an option
             self.findings.append(node)
-        node['summary'] = self._extract_summary(node.get('description', ''))
+        else:
+            self.hidden.append(node)
+        node.summary = self._extract_summary(node.description or '')
         self.clear_description = True
     
     def handle_descriptive_comment(self, node, db):
         """document SPEC descriptive comment structures"""
-        self.description = node['text']
+        self.description = node.text
     
     def handle_extended_comment(self, node, db):
         """document SPEC extended comment structures"""
-        #start = node['start_line']
-        if node['parent'] == None:
+        #start = node.start_line
+        if node.parent == None:
             if not self.found_first_global_extended_comment:
                 # TODO: could override this rule with an option
                 self.findings.append(node)
                 self.found_first_global_extended_comment = True
     
+    def handle_warning(self, node, db):
+        """keep SPEC parse warnings (structures that never end)"""
+        self.warnings.append(node)
+        self.findings.append(node)
+    
     def handle_other(self, node, db):
         """document SPEC cdef, constant, global, local, and rdef structures"""
         if len(self.description)>0:
-            node['description'] = self.description
-            node['summary'] = self._extract_summary(self.description)
+            node.description = self.description
+            node.summary = self._extract_summary(self.description)
             self.clear_description = True
-        if not node['name'].startswith('_'):
+        if not node.name.startswith('_'):
             # TODO: could override this rule with an option
             self.findings.append(node)
+        else:
+            self.hidden.append(node)
     
 #    def _handle_ignore(self, node, db):
 #        """call this handler to ignore an identified SPEC macro file structure"""
@@ -328,19 +1163,7 @@ class SpecMacrofileParser:
         followed by a blank line, then either a parameter list or
         more extensive documentation, as needed.
         """
-        items = []
-        for mo in extended_comment_block_sig_re.finditer(self.buf):
-            start = self.find_pos_in_line_number(mo.start(1))
-            end = self.find_pos_in_line_number(mo.end(1))
-            text = mo.group(1)
-            items.append({
-                            'start_line': start, 
-                            'end_line':   end, 
-                            'objtype':    'extended comment',
-                            'text':       text,
-                            'parent':     None,
-                          })
-        return items
+        return self._list_objtypes('extended comment')
 
     def list_descriptive_comments(self):
         """
@@ -358,133 +1181,29 @@ class SpecMacrofileParser:
             #: clear the ccd shutter handler
             rdef ccdset_shutter ''
         """
-        items = []
-        for mo in variable_description_re.finditer(self.buf):
-            start = self.find_pos_in_line_number(mo.start(1))
-            end = self.find_pos_in_line_number(mo.end(1))
-            items.append({
-                            'start_line': start, 
-                            'end_line':   end, 
-                            'objtype':    'descriptive comment',
-                            'text':       mo.group(1),
-                            'parent':     None,
-                          })
-        return items
+        return self._list_objtypes('descriptive comment')
 
     def list_variables(self):
         """
         parse the internal buffer for local, global, and constant variable declarations
         """
-        items = []
-        for mo in lgc_variable_sig_re.finditer(self.buf):
-            start = self.find_pos_in_line_number(mo.start(1))
-            end = self.find_pos_in_line_number(mo.end(1))
-            objtype = mo.group(1)
-            content = mo.group(2)
-            p = content.find('#')
-            if p >= 0:                                      # strip off any comment
-                content = content[:p]
-            content = re.sub('[,;]', ' ', content)          # replace , or ; with blank space
-            if content.find('[') >= 0:
-                content = re.sub('\s*?\[', '[', content)    # remove blank space before [
-            if objtype in ('constant'):
-                name = content.strip().split()[0]
-                items.append({
-                                'start_line': start, 
-                                'end_line':   end, 
-                                'objtype':    objtype,
-                                'name':       name,
-                                'parent':     None,
-                              })
-            else:
-                for var in variable_name_re.finditer(content):
-                    name = var.group(1)
-                    if len(name) > 0:
-                        items.append({
-                                        'start_line': start, 
-                                        'end_line':   end, 
-                                        'objtype':    objtype,
-                                        'name':       name,
-                                        'parent':     None,
-                                      })
-        return items
+        return self._list_objtypes('local', 'global', 'constant')
 
     def list_def_macros(self):
         """
         parse the internal buffer for def and rdef macro declarations
         """
-        items = []
-        for mo in spec_macro_declaration_match_re.finditer(self.buf):
-            objtype = mo.group(1)
-            start = self.find_pos_in_line_number(mo.start(1))
-            end = self.find_pos_in_line_number(mo.end(4))
-            args = mo.group(3)
-            # TODO: What if args is multi-line?  flatten.  What if really long?
-            if start == 225 and end == 225:
-                pass
-            if args is not None:
-                if len(args)>2:
-                    m = args_match_re.search(args)
-                    if m is not None:
-                        objtype = 'function ' + objtype
-                        if 'function rdef' == objtype:
-                            pass  # TODO: Should we do something special here?
-                        args = m.group(1)
-                elif args == '()':
-                    objtype = 'function ' + objtype
-            d = {
-                'start_line': start, 
-                'end_line':   end, 
-                'objtype':    objtype,
-                'name':       mo.group(2),
-                'args':       str(args),
-                'body':       mo.group(4),
-                'comment':    mo.group(5),
-                'parent':     None,
-            }
-            items.append(d)
-        return items
+        return self._list_objtypes(*macro_objtypes)
 
     def list_cdef_macros(self):
         """
         parse the internal buffer for cdef macro declarations
         """
-        # too complicated for a regular expression, just look for the initial part
-        items = []
-        for mo in re.finditer('cdef\s*?\(', self.buf):
-            # look at each potential cdef declaration
-            objtype = 'cdef'
-            start = self.find_pos_in_line_number(mo.start())
-            s = p = mo.end()                # offset s for start of args
-            nesting = 1                     # number of nested parentheses
-            sign = {'(': 1, ')': -1}        # increment or decrement
-            while nesting > 0 and p < len(self.buf):
-                if self.buf[p] in sign.keys():
-                    nesting += sign[self.buf[p]]
-                p += 1
-            e = p
-            text = self.buf[s:e-1]    # carve it out, and remove cdef( ... ) wrapping
-            end = self.find_pos_in_line_number(e)
-            p = text.find(',')
-            name = text[:p].strip('"')
-            if len(name) == 0:
-                name = '<empty name>'
-            args = text[p+1:]
-            # TODO: parse "args" for content
-            # TODO: What if args is multi-line?  convert \n to ;
-            #   args = ';'.join(args.splitlines())  # WRONG: This converts string content, as well
-            # TODO: What if args is really long?
-            items.append({
-                            'start_line': start, 
-                            'end_line':   end, 
-                            'objtype':    objtype,
-                            'name':       name,
-                            'args':       args,
-#                            'body':       mo.group(4),
-#                            'comment':    mo.group(5),
-                            'parent':     None,
-                          })
-        return items
+        return self._list_objtypes('cdef')
+
+    def _list_objtypes(self, *objtypes):
+        """list the items of the given object types, in order of appearance"""
+        return [item for item in self.scan() if item.objtype in objtypes]
 
     def find_pos_in_line_number(self, pos):
         """
@@ -492,116 +1211,201 @@ class SpecMacrofileParser:
         
         :param int pos: position in the file
         """
-        # TODO: optimize this straight search using a search by bisection
-        linenumber = None
-        for linenumber, start, end in self.line_positions:
-            if start <= pos < end:
-                break
-        return linenumber
+        return bisect_right(self.line_offsets, pos)
+
+    def find_pos_in_line_numbers(self, positions):
+        """
+        find the line numbers that include each of *positions*
+        
+        Sorted positions are matched to lines in a single pass
+        through the line offset table.
+        
+        :param [int] positions: positions in the file, in increasing order
+        :returns [int]: line number for each position
+        """
+        offsets = self.line_offsets
+        size = len(offsets)
+        numbers = []
+        linenumber = 0
+        last = 0
+        for pos in positions:
+            if pos < last:
+                # out of order: start again from this position
+                linenumber = bisect_right(offsets, pos)
+            while linenumber < size and offsets[linenumber] <= pos:
+                linenumber += 1
+            numbers.append(linenumber)
+            last = pos
+        return numbers
+    
+    def iter_names(self):
+        """
+        generator: (name, line number, assigned) of each name in the code 
+        of the file, in file order, not those in strings or comments
+        
+        *assigned* is True where the name (or an element of it) is given
+        a value, such as ``x = 1`` or ``x[2] += 1``.  This is one pass
+        through the internal buffer (and one through the line offsets).
+        """
+        if self.buf is None:
+            raise RuntimeError, "file not loaded (stream mode): " + self.filename
+        names = [(mo.group(1), mo.start(1), mo.group(2) is not None) 
+                 for mo in name_token_re.finditer(self.buf) if mo.group(1) is not None]
+        lines = self.find_pos_in_line_numbers([pos for name, pos, assigned in names])  #@UnusedVariable
+        for (name, pos, assigned), linenumber in zip(names, lines):   #@UnusedVariable
+            yield name, linenumber, assigned
     
     #------------------------ reporting section below ----------------------------------
 
     def _simple_ReST_renderer(self):
-        """create a simple ReStructured Text rendition of the findings"""
+        """
+        generator: a simple ReStructured Text rendition of the findings
+        
+        Each item produced is (*text*, *part*), where *text* is one or more 
+        lines of reST and *part* tells what those lines describe, if
+        they could be made into document nodes directly:
+        ``('desc', objtype, name, args)`` for the directive that describes
+        a finding and ``('table', labels, rows)`` for a summary table,
+        otherwise None.
+        Only the table rows are kept until all the findings are rendered.
+        """
         declarations = []       # variables and constants
         macros = []             # def, cdef, and rdef macros
         functions = []          # def and rdef function macros
-        s = []
-        for r in self.findings:
+        for r in self.iter_findings():
             # TODO: need to define subsections such as these:
             #    Summary (if present)
             #    Documentation (if present)
             #    Declarations
             #    Tables
-            if r['objtype'] == 'extended comment':
+            if r.objtype == 'extended comment':
                 # TODO: apply rules to suppress reporting under certain circumstances
-                s.append( '' )
-                s.append( '.. %s %s %d %d' % (self.filename, 
-                                              r['objtype'], 
-                                              r['start_line'], 
-                                              r['end_line']) )
-                s.append( '' )
-                s.append(r['text'])
-                s.append( '' )
+                yield '', None
+                yield '.. %s %s %d %d' % (self.filename, 
+                                        r.objtype, 
+                                        r.start_line, 
+                                        r.end_line), None
+                yield '', None
+                yield r.text, None
+                yield '', None
 #                s.append( '-'*10 )
 #                s.append( '' )
-            elif r['objtype'] in ('def', 'rdef', 'cdef', ):
+            elif r.objtype in ('def', 'rdef', 'cdef', ):
                 # TODO: apply rules to suppress reporting under certain circumstances
-                macros.append(r)
-                s.append( '' )
-                s.append( '.. %s %s %s %d %d' % (self.filename, 
-                                              r['objtype'], 
-                                              r['name'], 
-                                              r['start_line'], 
-                                              r['end_line']) )
-                s.append( '.. spec:%s:: %s' % ( r['objtype'], r['name'],) )
-                s.append('')
-                s.append(' '*4 + '*' + r['objtype'] + ' macro declaration*')
-                desc = r.get('description', '')
+                macros.append(_table_entry(r))
+                yield '', None
+                yield '.. %s %s %s %d %d' % (self.filename, 
+                                           r.objtype, 
+                                           r.name, 
+                                           r.start_line, 
+                                           r.end_line), None
+                yield '.. spec:%s:: %s' % ( r.objtype, r.name,), ('desc', r.objtype, r.name, None)
+                yield '', None
+                yield ' '*4 + '*' + r.objtype + ' macro declaration*', None
+                desc = r.description or ''
                 if len(desc) > 0:
-                    s.append('')
+                    yield '', None
                     for line in desc.splitlines():
-                        s.append(' '*4 + line)
-                s.append( '' )
-            elif r['objtype'] in ('function def', 'function rdef',):
+                        yield ' '*4 + line, None
+                yield '', None
+            elif r.objtype in ('function def', 'function rdef',):
                 # TODO: apply rules to suppress reporting under certain circumstances
-                functions.append(r)
-                objtype = r['objtype'].split()[1]
-                s.append( '' )
-                s.append( '.. %s %s %s %d %d' % (self.filename, 
-                                              objtype, 
-                                              r['name'], 
-                                              r['start_line'], 
-                                              r['end_line']) )
-                s.append( '.. spec:%s:: %s(%s)' % ( objtype, r['name'], r['args']) )
-                s.append('')
-                s.append(' '*4 + '*' + r['objtype'].split()[1] + '() macro function declaration*')
-                desc = r.get('description', '')
+                functions.append(_table_entry(r))
+                objtype = r.objtype.split()[1]
+                yield '', None
+                yield '.. %s %s %s %d %d' % (self.filename, 
+                                           objtype, 
+                                           r.name, 
+                                           r.start_line, 
+                                           r.end_line), None
+                yield '.. spec:%s:: %s(%s)' % ( objtype, r.name, r.args), ('desc', objtype, r.name, r.args)
+                yield '', None
+                yield ' '*4 + '*' + r.objtype.split()[1] + '() macro function declaration*', None
+                desc = r.description or ''
                 if len(desc) > 0:
-                    s.append('')
+                    yield '', None
                     for line in desc.splitlines():
-                        s.append(' '*4 + line)
-                s.append( '' )
+                        yield ' '*4 + line, None
+                yield '', None
             
             # Why document local variables in a global scope?
-            elif r['objtype'] in ('global', 'constant'):
+            elif r.objtype in ('global', 'constant'):
                 # TODO: apply rules to suppress reporting under certain circumstances
-                declarations.append(r)
-                if r.get('parent') is None:
-                    s.append( '.. spec:%s:: %s' % ( r['objtype'], r['name']) )
-                    s.append('')
-                    if r['objtype'] in ('constant'):
-                        s.append(' '*4 + '*constant declaration*')
+                declarations.append(_table_entry(r))
+                if r.parent is None:
+                    yield '.. spec:%s:: %s' % ( r.objtype, r.name), ('desc', r.objtype, r.name, None)
+                    yield '', None
+                    if r.objtype in ('constant'):
+                        yield ' '*4 + '*constant declaration*', None
                     else:
-                        s.append(' '*4 + '*' + r['objtype'] + ' variable declaration*')
-                    desc = r.get('description', '')
+                        yield ' '*4 + '*' + r.objtype + ' variable declaration*', None
+                    desc = r.description or ''
                     if len(desc) > 0:
-                        s.append('')
+                        yield '', None
                         for line in desc.splitlines():
-                            s.append(' '*4 + line)
-                    s.append( '' )
+                            yield ' '*4 + line, None
+                    yield '', None
 
 #        s.append( '-'*10 )
 #        s.append( '' )
 
-        s += _report_table('Variable Declarations (%s)' % self.filename, declarations, 
-                          ('objtype', 'name', 'start_line', 'summary', ))
-        s += _report_table('Macro Declarations (%s)' % self.filename, macros, 
-                          ('objtype', 'name', 'start_line', 'end_line', 'summary', ))
-        s += _report_table('Function Macro Declarations (%s)' % self.filename, functions, 
-                          ('objtype', 'name', 'start_line', 'end_line', 'args', 'summary', ))
-        #s += _report_table('Findings from .mac File', self.findings, ('start_line', 'objtype', 'line', 'summary', ))
-
-        return '\n'.join(s)
+        tables = (
+            ('Variable Declarations (%s)' % self.filename, declarations, 
+             ('objtype', 'name', 'start_line', 'summary', )),
+            ('Macro Declarations (%s)' % self.filename, macros, 
+             ('objtype', 'name', 'start_line', 'end_line', 'summary', )),
+            ('Function Macro Declarations (%s)' % self.filename, functions, 
+             ('objtype', 'name', 'start_line', 'end_line', 'args', 'summary', )),
+            #('Findings from .mac File', self.findings, ('start_line', 'objtype', 'line', 'summary', )),
+        )
+        for title, itemlist, col_keys in tables:
+            rows = _table_rows(itemlist, col_keys)
+            if len(rows) > 0:
+                lines = make_rest_table(title, col_keys, rows, '=')
+                yield '\n'.join(lines[:4]), None         # section heading
+                yield '\n'.join(lines[4:]), ('table', col_keys, rows)
 
     def ReST(self, style = 'simple'):
         """create the ReStructured Text from what has been found"""
+        return '\n'.join(text for text, part in self._renderer(style)())
+
+    def iter_ReST(self, style = 'simple'):
+        """
+        generator: each line of the ReStructured Text from what has been found
+        
+        The findings are rendered as they are produced (see :meth:`iter_findings`).
+        """
+        for lines, part in self.iter_ReST_parts(style):       #@UnusedVariable
+            for line in lines:
+                yield line
+
+    def iter_ReST_parts(self, style = 'simple'):
+        """
+        generator: (lines, part) for each part of the ReStructured Text,
+        as :meth:`iter_ReST`, where *part* tells what the lines describe
+        (see :meth:`_simple_ReST_renderer`)
+        """
+        for text, part in self._renderer(style)():
+            lines = text.splitlines()
+            if len(text) == 0 or text[-1] in '\r\n':
+                lines.append('')
+            yield lines, part
+
+    def _renderer(self, style):
+        """the method that renders the findings in this *style*"""
     
         # allow for additional renderers, selectable by options
         renderer_dict =  {'simple': self._simple_ReST_renderer,}
         if style not in renderer_dict:
             raise RuntimeWarning, "%s renderer not found, using `simple`" % style
-        return renderer_dict[style]()
+        return renderer_dict[style]
+
+
+def _table_entry(item):
+    """a finding with only the fields of *item* that are shown in the summary tables"""
+    entry = Finding(item.start_line, item.end_line, item.objtype, item.name, args=item.args)
+    entry.summary = item.summary
+    return entry
 
 
 def _report_table(title, itemlist, col_keys = ('objtype', 'start_line', 'end_line', )):
@@ -609,12 +1413,17 @@ def _report_table(title, itemlist, col_keys = ('objtype', 'start_line', 'end_lin
     return the itemlist as a reST table
     
     :param str title:  section heading above the table
-    :param {str,str} itemlist: database (keyed dictionary) to use for table
+    :param [Finding] itemlist: database (findings or keyed dictionaries) to use for table
     :param [str] col_keys: column labels (must be keys in the dictionary)
     :returns [str]: the table (where each list item is a string of reST)
     """
     if len(itemlist) == 0:
         return []
+    return make_rest_table(title, col_keys, _table_rows(itemlist, col_keys), '=')
+
+
+def _table_rows(itemlist, col_keys):
+    """the rows of the table of *itemlist* (see :func:`_report_table`), one per start line"""
     rows = []
     last_line = None
     for d in itemlist:
@@ -622,7 +1431,7 @@ def _report_table(title, itemlist, col_keys = ('objtype', 'start_line', 'end_lin
             rowdata = [str(d.get(key,'')).strip() for key in col_keys]
             rows.append( tuple(rowdata) )
         last_line = d['start_line']
-    return make_rest_table(title, col_keys, rows, '=')
+    return rows
 
 
 def make_rest_table(title, labels, rows, titlechar = '='):
@@ -0,0 +1,702 @@
+# -*- coding: utf-8 -*-
+"""
+    sphinxcontrib.specmacroindex
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    :synopsis: index of the symbols found in a library of SPEC macro files
+
+    Each :class:`~sphinxcontrib.specmacrofileparser.SpecMacrofileParser`
+    knows only its own file.  The index knows where each macro and
+    variable is found in all the files of a library, and is updated
+    one file at a time, as files change.  The database keeps the same 
+    (and their descriptions, for full-text search) in an SQLite file.
+    The call graph knows which macros call which, and the usage index
+    where each variable is used.
+
+    :copyright: Copyright 2012-2014 by BCDA, Advanced Photon Source, Argonne National Laboratory
+    :license: ANL Open Source License, see LICENSE for details.
+"""
+
+import multiprocessing
+import re
+import sqlite3
+from array import array
+from bisect import bisect_left, bisect_right, insort
+
+from specmacrofileparser import PARSER_VERSION, SpecMacrofileParser, file_digest, macro_objtypes
+
+
+# object types kept in the symbol index
+symbol_objtypes = macro_objtypes + ('cdef', 'global', 'local', 'constant')
+
+# object types of the macros in the call graph
+callable_objtypes = macro_objtypes + ('cdef', )
+
+# object types of variable declarations
+variable_objtypes = ('global', 'local', 'constant')
+
+# names in SPEC code that are never variables
+spec_keywords = frozenset('''
+    break cdef constant continue def delete else exit for global history if in 
+    local lsdef prdef quit rdef return undef unglobal while
+    '''.split())
+
+# in the code of a macro body:  an extended comment, a string, 
+# or a comment (none is a call), or a name
+body_token_re = re.compile(
+                        r'"{3}[\s\S]*?(?:"{3}|\Z)'        # extended comment
+                        + r'|"(?:[^"\\\n]|\\.)*"?'         # string
+                        + r'|(?<!\$)#[^\n]*'                     # comment (not $#)
+                        + r'|([A-Za-z_]\w*)'                  # 1: name
+                        )
+
+
+class SpecSymbolIndex:
+    """
+    Where each macro and variable is found in a library of SPEC macro files
+
+    Each location is (file name, line number, object type).  The index
+    keeps only these (not the findings, which may refer to a memory map
+    of their file), so it is small, and can be pickled.
+
+    Hidden macros and variables (names that start with ``_``, which are
+    not documented) are indexed too, since two files that define the same
+    hidden macro conflict as much as any.  Lookups include them unless
+    asked not to (``hidden=False``).
+
+    * :meth:`lookup` is a dictionary lookup
+    * :meth:`prefix` bisects the sorted table of names
+    * :meth:`update` (and :meth:`remove`) change only the entries of one file
+    """
+
+    def __init__(self):
+        self.files = {}         # file name: (content hash, ((name, line, objtype), ...))
+        self.names = {}         # name: [(file name, line, objtype), ...] in order
+        self.sorted_names = []  # all names, sorted
+        self.version = PARSER_VERSION   # of the parser that made the entries
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.names
+
+    def update(self, filename, findings, digest = None):
+        """
+        replace the entries of *filename* with the symbols among *findings*
+
+        :param str filename: name (with optional path) of the SPEC macro file
+        :param [obj] findings: what the parser found in that file,
+            with its hidden macros and variables (``parser.findings + parser.hidden``)
+            (only *name*, *start_line*, and *objtype* are used)
+        :param str digest: (optional) content hash of the file,
+            for :meth:`refresh`
+        """
+        symbols = tuple([(item.name, item.start_line, item.objtype)
+                         for item in findings
+                         if item.objtype in symbol_objtypes and _is_symbol(item.name)])
+        self.remove(filename)
+        self.files[filename] = (digest, symbols)
+        for name, line, objtype in symbols:
+            locations = self.names.get(name)
+            if locations is None:
+                locations = self.names[name] = []
+                insort(self.sorted_names, name)
+            locations.append((filename, line, objtype))
+        for name in set([symbol[0] for symbol in symbols]):
+            self.names[name].sort()
+
+    def remove(self, filename):
+        """forget the entries of *filename* (if any)"""
+        entry = self.files.pop(filename, None)
+        if entry is None:
+            return
+        for name in set([symbol[0] for symbol in entry[1]]):
+            locations = [loc for loc in self.names[name] if loc[0] != filename]
+            if len(locations) > 0:
+                self.names[name] = locations
+            else:
+                del self.names[name]
+                del self.sorted_names[bisect_left(self.sorted_names, name)]
+
+    def refresh(self, macrofiles, cache = None, workers = 1):
+        """
+        index those of *macrofiles* whose content has changed (or is new)
+
+        :param [str] macrofiles: names (with optional paths) of SPEC macro files
+        :param obj cache: (optional) keeps the findings by content hash,
+            such as :class:`~sphinxcontrib.specmacrofilecache.SpecDiskCache`
+        :param int workers: number of processes that parse the files
+            (None for one per CPU)
+        :returns [str]: the files indexed again
+        """
+        if getattr(self, 'version', None) != PARSER_VERSION:
+            # made by another version of the parser:  index every file again
+            self.files, self.names, self.sorted_names = {}, {}, []
+            self.version = PARSER_VERSION
+        stale = []
+        for macrofile in macrofiles:
+            digest = file_digest(macrofile)
+            entry = self.files.get(macrofile)
+            if entry is None or entry[0] != digest:
+                stale.append((macrofile, digest))
+        for batch in _parse_batches(stale, cache, workers):
+            for macrofile, digest, parser in batch:
+                self.update(macrofile, parser.findings + parser.hidden, digest)
+        return [macrofile for macrofile, digest in stale]     #@UnusedVariable
+
+    def lookup(self, name, objtypes = None, hidden = True):
+        """
+        list the (file name, line number, object type) where *name* is found
+
+        :param str name: name of the macro or variable
+        :param [str] objtypes: (optional) only these object types
+        :param bool hidden: (optional) False to find nothing for a hidden name
+        """
+        if not hidden and is_hidden(name):
+            return []
+        locations = self.names.get(name, [])
+        if objtypes is not None:
+            locations = [loc for loc in locations if loc[2] in objtypes]
+        return list(locations)
+
+    def prefix(self, text, hidden = True):
+        """
+        list the names that start with *text*, sorted
+
+        :param bool hidden: (optional) False to leave out hidden names
+        """
+        names = self.sorted_names
+        # names are identifiers:  none has a character after '\xff'
+        found = names[bisect_left(names, text):bisect_left(names, text + '\xff')]
+        if not hidden:
+            found = [name for name in found if not is_hidden(name)]
+        return found
+
+    def duplicates(self, objtypes = macro_objtypes, hidden = True):
+        """
+        names defined more than once:  {name: [locations]}
+
+        A *cdef* macro is built from many parts, and a variable may well
+        be declared in many places, so by default only *def* and *rdef*
+        macros are reported.
+
+        :param [str] objtypes: object types of the definitions to compare
+        :param bool hidden: (optional) False to leave out hidden names
+        """
+        report = {}
+        for name, locations in self.names.iteritems():
+            if not hidden and is_hidden(name):
+                continue
+            found = [loc for loc in locations if loc[2] in objtypes]
+            if len(found) > 1:
+                report[name] = found
+        return report
+
+    def filenames(self):
+        """the files indexed, sorted"""
+        return sorted(self.files)
+
+
+class SpecSymbolDatabase:
+    """
+    The macros and variables (and the first extended comment) of a library
+    of SPEC macro files, with their descriptions, in an SQLite database
+
+    The descriptions and summaries are searched with SQLite's full-text 
+    search (FTS5, or FTS4 where SQLite is older), so a prebuilt database
+    answers "which macros mention *shutter*?" without parsing any file.
+    Each file is indexed again only when its content hash changes.
+    The database is rebuilt if it was made by another version of the parser.
+
+    :param str filename: name of the database file (``:memory:`` to keep it in memory)
+    """
+
+    def __init__(self, filename = ':memory:'):
+        self.connection = sqlite3.connect(filename)
+        self.fts = _fts_module(self.connection)
+        if self.connection.execute('PRAGMA user_version').fetchone()[0] != PARSER_VERSION:
+            self._create()
+
+    def _create(self):
+        with self.connection as db:
+            db.executescript('''
+                DROP TABLE IF EXISTS symbols_text;
+                DROP TABLE IF EXISTS symbols;
+                DROP TABLE IF EXISTS files;
+                CREATE TABLE files (
+                    id INTEGER PRIMARY KEY, 
+                    filename TEXT UNIQUE NOT NULL, 
+                    digest TEXT);
+                CREATE TABLE symbols (
+                    id INTEGER PRIMARY KEY,
+                    file_id INTEGER NOT NULL REFERENCES files(id),
+                    name TEXT, objtype TEXT NOT NULL, 
+                    start_line INTEGER, end_line INTEGER,
+                    parent TEXT, args TEXT, summary TEXT, description TEXT);
+                CREATE INDEX symbols_name ON symbols(name);
+                CREATE INDEX symbols_file ON symbols(file_id);
+                CREATE VIRTUAL TABLE symbols_text USING %s(name, summary, description);
+            ''' % self.fts)
+            db.execute('PRAGMA user_version = %d' % PARSER_VERSION)
+
+    def close(self):
+        self.connection.close()
+
+    def digest(self, filename):
+        """content hash of *filename* when it was indexed (None if it is not)"""
+        row = self.connection.execute('SELECT digest FROM files WHERE filename = ?', 
+                                      (filename,)).fetchone()
+        if row is None:
+            return None
+        return row[0]
+
+    def update(self, filename, findings, digest = None):
+        """
+        replace the entries of *filename* with *findings*
+        
+        Call this within a transaction (``with database.connection:``), 
+        as :meth:`refresh` does for each batch of files.
+
+        :param str filename: name (with optional path) of the SPEC macro file
+        :param [obj] findings: what the parser found in that file,
+            with its hidden macros and variables (``parser.findings + parser.hidden``)
+        :param str digest: (optional) content hash of the file
+        """
+        db = self.connection
+        self._remove(filename)
+        file_id = db.execute('INSERT INTO files (filename, digest) VALUES (?, ?)', 
+                             (_text(filename), digest)).lastrowid
+        for item in findings:
+            if item.objtype in symbol_objtypes and _is_symbol(item.name):
+                name = item.name
+            elif item.objtype == 'extended comment':
+                name = None
+            else:
+                continue
+            row = (file_id, _text(name), item.objtype, item.start_line, item.end_line, 
+                   _text(item.parent), _text(item.args), _text(item.summary), 
+                   _text(item.description or item.text))
+            rowid = db.execute('''INSERT INTO symbols 
+                (file_id, name, objtype, start_line, end_line, parent, args, summary, description)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)''', row).lastrowid
+            db.execute('INSERT INTO symbols_text (rowid, name, summary, description) VALUES (?, ?, ?, ?)',
+                       (rowid, row[1], row[7], row[8]))
+
+    def remove(self, filename):
+        """forget the entries of *filename* (if any)"""
+        with self.connection:
+            self._remove(filename)
+
+    def _remove(self, filename):
+        db = self.connection
+        row = db.execute('SELECT id FROM files WHERE filename = ?', (_text(filename),)).fetchone()
+        if row is None:
+            return
+        db.execute('''DELETE FROM symbols_text WHERE rowid IN 
+            (SELECT id FROM symbols WHERE file_id = ?)''', row)
+        db.execute('DELETE FROM symbols WHERE file_id = ?', row)
+        db.execute('DELETE FROM files WHERE id = ?', row)
+
+    def refresh(self, macrofiles, cache = None, workers = 1):
+        """
+        index those of *macrofiles* whose content has changed (or is new),
+        in one transaction for each batch of files
+
+        :param [str] macrofiles: names (with optional paths) of SPEC macro files
+        :param obj cache: (optional) keeps the findings by content hash,
+            such as :class:`~sphinxcontrib.specmacrofilecache.SpecDiskCache`
+        :param int workers: number of processes that parse the files
+            (None for one per CPU)
+        :returns [str]: the files indexed again
+        """
+        known = dict(self.connection.execute('SELECT filename, digest FROM files'))
+        stale = []
+        for macrofile in macrofiles:
+            digest = file_digest(macrofile)
+            if known.get(_text(macrofile)) != digest:
+                stale.append((macrofile, digest))
+        for batch in _parse_batches(stale, cache, workers):
+            with self.connection:
+                for macrofile, digest, parser in batch:
+                    self.update(macrofile, parser.findings + parser.hidden, digest)
+        return [macrofile for macrofile, digest in stale]     #@UnusedVariable
+
+    def filenames(self):
+        """the files indexed, sorted"""
+        return [row[0] for row in self.connection.execute('SELECT filename FROM files ORDER BY filename')]
+
+    def lookup(self, name, objtypes = None, hidden = True):
+        """
+        list the (file name, line number, object type) where *name* is found,
+        as :meth:`SpecSymbolIndex.lookup`
+        """
+        if not hidden and is_hidden(name):
+            return []
+        rows = self.connection.execute('''SELECT f.filename, s.start_line, s.objtype
+            FROM symbols s JOIN files f ON s.file_id = f.id
+            WHERE s.name = ? ORDER BY f.filename, s.start_line''', (_text(name),))
+        return [row for row in rows if objtypes is None or row[2] in objtypes]
+
+    def prefix(self, text, hidden = True):
+        """list the names that start with *text*, sorted, as :meth:`SpecSymbolIndex.prefix`"""
+        text = _text(text)
+        rows = self.connection.execute('''SELECT DISTINCT name FROM symbols 
+            WHERE name >= ? AND name < ? ORDER BY name''', (text, text + u'\uffff'))
+        return [row[0] for row in rows if hidden or not is_hidden(row[0])]
+
+    def search(self, query, objtypes = None, limit = 50):
+        """
+        the best matches of a full-text *query* of the names, summaries, 
+        and descriptions:  a list of (name, object type, file name, line number, summary)
+        
+        The *query* is in the syntax of SQLite full-text search, such as 
+        ``shutter``, ``shut*``, or ``shutter OR epics``.
+        A query not in that syntax raises ValueError.
+
+        :param [str] objtypes: (optional) only these object types
+        :param int limit: the most to return (None for all)
+        """
+        sql = '''SELECT s.name, s.objtype, f.filename, s.start_line, s.summary
+            FROM symbols_text t JOIN symbols s ON s.id = t.rowid JOIN files f ON s.file_id = f.id
+            WHERE symbols_text MATCH ?'''
+        args = [_text(query)]
+        if objtypes is not None:
+            sql += ' AND s.objtype IN (%s)' % ', '.join(['?'] * len(objtypes))
+            args += list(objtypes)
+        if self.fts == 'fts5':
+            sql += ' ORDER BY t.rank'       # best match first
+        else:
+            sql += ' ORDER BY s.name'
+        if limit is not None:
+            sql += ' LIMIT %d' % limit
+        try:
+            return self.connection.execute(sql, args).fetchall()
+        except sqlite3.OperationalError, exc:
+            raise ValueError, "not a full-text search query: %r (%s)" % (query, exc)
+
+
+class SpecCallGraph:
+    """
+    Which macros call which, in a library of SPEC macro files
+
+    A macro calls another if the name of the other is in its body, 
+    outside of strings and comments.  The body of a *cdef* part is the
+    code added to the chained macro, so the chained macro calls what 
+    that code calls.  Macros are known by name, as SPEC knows them.
+
+    Each body is split into its names once, when its file is added, with
+    one regular expression:  a name is then matched to all the macros of
+    the library by one set intersection, rather than searching each body 
+    for each macro name.  The graph is made again (from the names kept
+    for each body) only when it is used after a file has changed.
+    """
+
+    def __init__(self):
+        self.files = {}         # file name: [(macro name, frozenset(names in its body)), ...]
+        self._calls = None      # macro name: set(names of the macros it calls)
+        self._called_by = None  # macro name: set(names of the macros that call it)
+
+    def update(self, filename, findings):
+        """
+        replace the macros of *filename* with those among *findings*
+
+        :param str filename: name (with optional path) of the SPEC macro file
+        :param [obj] findings: what the parser found in that file,
+            with its hidden macros (``parser.findings + parser.hidden``)
+        """
+        macros = []
+        for item in findings:
+            if item.objtype in callable_objtypes and _is_symbol(item.name):
+                macros.append((item.name, frozenset(_body_names(item.body))))
+        self.files[filename] = macros
+        self._calls = self._called_by = None
+
+    def remove(self, filename):
+        """forget the macros of *filename* (if any)"""
+        if self.files.pop(filename, None) is not None:
+            self._calls = self._called_by = None
+
+    def refresh(self, macrofiles, cache = None, workers = 1):
+        """
+        add (or add again) *macrofiles*, parsed a batch at a time
+
+        :param [str] macrofiles: names (with optional paths) of SPEC macro files
+        :param obj cache: (optional) keeps the findings by content hash,
+            such as :class:`~sphinxcontrib.specmacrofilecache.SpecDiskCache`
+        :param int workers: number of processes that parse the files
+            (None for one per CPU)
+        """
+        stale = [(macrofile, None) for macrofile in macrofiles]
+        for batch in _parse_batches(stale, cache, workers):
+            for macrofile, digest, parser in batch:     #@UnusedVariable
+                self.update(macrofile, parser.findings + parser.hidden)
+
+    def _build(self):
+        if self._calls is not None:
+            return
+        names = set()
+        for macros in self.files.itervalues():
+            names.update([name for name, words in macros])    #@UnusedVariable
+        calls = dict([(name, set()) for name in names])
+        called_by = dict([(name, set()) for name in names])
+        for macros in self.files.itervalues():
+            for name, words in macros:
+                callees = names.intersection(words)
+                callees.discard(name)
+                calls[name] |= callees
+                for callee in callees:
+                    called_by[callee].add(name)
+        self._calls, self._called_by = calls, called_by
+
+    def macros(self):
+        """names of all the macros, sorted"""
+        self._build()
+        return sorted(self._calls)
+
+    def calls(self, name):
+        """names of the macros that macro *name* calls, sorted"""
+        self._build()
+        return sorted(self._calls.get(name, ()))
+
+    def called_by(self, name):
+        """names of the macros that call macro *name*, sorted"""
+        self._build()
+        return sorted(self._called_by.get(name, ()))
+
+    def edges(self):
+        """generator: (caller, callee) for each call, sorted"""
+        self._build()
+        for name in sorted(self._calls):
+            for callee in sorted(self._calls[name]):
+                yield name, callee
+
+    def unreachable(self, roots = None):
+        """
+        names of the macros that are never called, sorted
+
+        :param [str] roots: (optional) the macros that are used directly
+            (such as those typed at the SPEC prompt, or called by SPEC itself): 
+            then, the macros that are not called by any of these, directly
+            or indirectly.  Otherwise, the macros that no other macro calls.
+        """
+        self._build()
+        if roots is None:
+            return sorted([name for name, callers in self._called_by.iteritems() if len(callers) == 0])
+        reached = set()
+        todo = [name for name in roots if name in self._calls]
+        while len(todo) > 0:
+            name = todo.pop()
+            if name not in reached:
+                reached.add(name)
+                todo.extend(self._calls[name] - reached)
+        return sorted(set(self._calls) - reached)
+
+
+def _body_names(body):
+    """the names in the code of a macro *body* (not in its strings or comments)"""
+    if not body:
+        return []
+    return [name for name in body_token_re.findall(body) if name]
+
+
+class SpecUsageIndex:
+    """
+    Where each variable is used (read or given a value), in a library of SPEC macro files
+
+    Each usage is (file name, line number, macro, assigned), where *macro*
+    is the name of the innermost def or rdef macro around that line
+    (None in the global scope) and *assigned* is True where the variable 
+    is given a value.  The names in each file are found by 
+    :meth:`~sphinxcontrib.specmacrofileparser.SpecMacrofileParser.iter_names`,
+    one more pass through the buffer the parser has already read.
+    The lines of the usages of each name are kept in a compact ``array``.
+    The name of a macro where it is defined, and the names in a declaration,
+    are not usages.
+
+    The macros and declarations are known from the parser's findings
+    and its hidden items (names that start with ``_``).  Each macro
+    knows the macro around it, so the innermost macro around a line
+    is found in as many steps as macros are nested there.
+    """
+
+    def __init__(self):
+        # file name: (declared {name: objtype}, macros [(start, end, name)] by start, 
+        #             macro start lines, index of the macro around each (-1 for none),
+        #             {name: array of (line*2 + assigned)})
+        self.files = {}
+
+    def update(self, filename, parser):
+        """
+        replace the entries of *filename* with those of its *parser*
+
+        :param str filename: name (with optional path) of the SPEC macro file
+        :param obj parser: :class:`~sphinxcontrib.specmacrofileparser.SpecMacrofileParser`
+            of that file (not in stream mode)
+        """
+        declared = {}
+        macros = []
+        defined = set()     # (name, line) where it is declared or defined
+        for item in parser.findings + parser.hidden:
+            if item.objtype in variable_objtypes and _is_symbol(item.name):
+                name = item.name.rstrip('[]')
+                declared.setdefault(name, item.objtype)
+            elif item.objtype in macro_objtypes:
+                name = item.name
+                macros.append((item.start_line, item.end_line, name))
+            else:
+                continue
+            defined.add((name, item.start_line))
+        macros.sort()
+        names = {}
+        for name, linenumber, assigned in parser.iter_names():
+            if name in spec_keywords:
+                continue
+            key = (name, linenumber)
+            if key in defined:
+                # the first on its line is the declaration (or the def)
+                defined.remove(key)
+                continue
+            lines = names.get(name)
+            if lines is None:
+                lines = names[name] = array('l')
+            lines.append(2*linenumber + assigned)
+        starts = array('l', [start for start, end, name in macros])     #@UnusedVariable
+        self.files[filename] = (declared, macros, starts, _enclosing(macros), names)
+
+    def remove(self, filename):
+        """forget the entries of *filename* (if any)"""
+        self.files.pop(filename, None)
+
+    def refresh(self, macrofiles, cache = None, workers = 1):
+        """
+        add (or add again) *macrofiles*, parsed a batch at a time
+
+        :param [str] macrofiles: names (with optional paths) of SPEC macro files
+        :param obj cache: (optional) keeps the findings by content hash,
+            such as :class:`~sphinxcontrib.specmacrofilecache.SpecDiskCache`
+        :param int workers: number of processes that parse the files
+            (None for one per CPU)
+        """
+        stale = [(macrofile, None) for macrofile in macrofiles]
+        for batch in _parse_batches(stale, cache, workers):
+            for macrofile, digest, parser in batch:     #@UnusedVariable
+                self.update(macrofile, parser)
+
+    def variables(self):
+        """names of the variables declared (global, local, or constant) in any file, sorted"""
+        names = set()
+        for declared, macros, starts, parents, usages in self.files.itervalues():     #@UnusedVariable
+            names.update(declared)
+        return sorted(names)
+
+    def usages(self, name):
+        """
+        list the (file name, line number, macro, assigned) where *name* is used, sorted
+
+        :param str name: name of the variable (without ``[]``)
+        """
+        found = []
+        for filename, (declared, macros, starts, parents, usages) in sorted(self.files.items()):     #@UnusedVariable
+            for code in usages.get(name, ()):
+                linenumber = code >> 1
+                found.append((filename, linenumber, _macro_at(macros, starts, parents, linenumber), 
+                              bool(code & 1)))
+        return found
+
+    def all_usages(self):
+        """the usages of each declared variable:  {name: [usages]}, as :meth:`usages`"""
+        return dict([(name, self.usages(name)) for name in self.variables()])
+
+    def undeclared(self):
+        """
+        variables given a value in the global scope but declared nowhere:
+        {name: [(file name, line number), ...]}
+
+        A name is not reported if it is declared (global, local, or constant)
+        in any file, is the name of a macro, or is hidden (starts with ``_``).
+        """
+        known = set(self.variables())
+        for declared, macros, starts, parents, usages in self.files.itervalues():     #@UnusedVariable
+            known.update([name for start, end, name in macros])             #@UnusedVariable
+        report = {}
+        for filename, (declared, macros, starts, parents, usages) in sorted(self.files.items()):     #@UnusedVariable
+            for name, lines in usages.iteritems():
+                if name in known or name.startswith('_'):
+                    continue
+                for code in lines:
+                    if code & 1 and _macro_at(macros, starts, parents, code >> 1) is None:
+                        report.setdefault(name, []).append((filename, code >> 1))
+        return report
+
+
+def _enclosing(macros):
+    """index of the macro around each of *macros* (sorted by start), or -1, in one sweep"""
+    parents = array('l')
+    stack = []          # indexes of the macros open at this start
+    for i, (start, end, name) in enumerate(macros):      #@UnusedVariable
+        while len(stack) > 0 and macros[stack[-1]][1] < start:
+            stack.pop()
+        parents.append(stack[-1] if len(stack) > 0 else -1)
+        stack.append(i)
+    return parents
+
+
+def _macro_at(macros, starts, parents, linenumber):
+    """
+    name of the innermost macro (of *macros*, by *starts*) around *linenumber*, or None
+
+    The last macro that starts by *linenumber* is either around it,
+    or is within every macro that is.
+    """
+    i = bisect_right(starts, linenumber) - 1
+    while i >= 0:
+        start, end, name = macros[i]        #@UnusedVariable
+        if end >= linenumber:
+            return name
+        i = parents[i]
+    return None
+
+
+def _fts_module(connection):
+    """the best full-text search module of this SQLite:  fts5 or fts4"""
+    for module in ('fts5', 'fts4'):
+        try:
+            connection.execute('CREATE VIRTUAL TABLE temp.fts_test USING %s(text)' % module)
+        except sqlite3.OperationalError:
+            continue
+        connection.execute('DROP TABLE temp.fts_test')
+        return module
+    raise RuntimeError, "SQLite has no full-text search (FTS5 or FTS4)"
+
+
+def _text(value):
+    """*value* as unicode text for SQLite (None stays None)"""
+    if value is None or isinstance(value, unicode):
+        return value
+    return str(value).decode('utf-8', 'replace')
+
+
+def _parse_batches(stale, cache, workers):
+    """
+    generator: parse the *stale* (file name, content hash) a batch at a time,
+    so that few of the files are mapped into memory at once
+
+    Each batch is a list of (file name, content hash, parser).
+    """
+    size = 4 * (workers or multiprocessing.cpu_count())
+    for i in range(0, len(stale), size):
+        some = stale[i:i+size]
+        parsers = SpecMacrofileParser.parse_many([macrofile for macrofile, digest in some],
+                                                 workers=workers, cache=cache)
+        yield [(macrofile, digest, parser) for (macrofile, digest), parser in zip(some, parsers)]
+
+
+def is_hidden(name):
+    """is *name* hidden from the documentation (it starts with ``_``)?"""
+    return name.startswith('_')
+
+
+def _is_symbol(name):
+    """is *name* the name of a macro or variable (not a placeholder such as ``<empty name>``)?"""
+    return name is not None and len(name) > 0 and not name.startswith('<')
@@ -0,0 +1,294 @@
+# -*- coding: utf-8 -*-
+"""
+    sphinxcontrib.specmacrotree
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    :synopsis: syntax tree of a SPEC macro file, made as it is used
+
+    The nodes of the tree are macro definitions (and their bodies),
+    ``{ }`` blocks, strings, ``cdef()`` calls, variable declarations,
+    comments, and extended comments.  The other code is between them.
+    Each node is a span of the parser's buffer.  The children of a node
+    are found (and kept, as compact tables of offsets) the first time
+    they are asked for, so a caller that looks only at the top level
+    never scans the inside of the macros.
+
+    :copyright: Copyright 2012-2014 by BCDA, Advanced Photon Source, Argonne National Laboratory
+    :license: ANL Open Source License, see LICENSE for details.
+"""
+
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+
+from specmacrofileparser import macro_objtypes, parse_cdef_args, cdef_fields, \
+    _declared_variables
+
+
+# kinds of node (kept in the tables as their index here)
+node_kinds = ('file', 'def', 'block', 'string', 'comment', 'extended comment',
+              'cdef', 'declaration')
+FILE, DEF, BLOCK, STRING, COMMENT, EXTENDED_COMMENT, CDEF, DECLARATION = range(len(node_kinds))
+
+# tokens that start (or are) a node in SPEC code
+tree_token_re = re.compile(
+                        r'(?P<xc>"{3}[\s\S]*?(?:"{3}|\Z))'     # extended comment
+                        + r'|(?P<str>"(?:[^"\\\n]|\\.)*"?)'     # string
+                        + r"|(?P<sq>'(?:[^'\\\n]|\\.)*'?)"     # string (single quotes)
+                        + r'|(?P<com>(?<!\$)#[^\n]*)'           # comment (not $#)
+                        + r'|(?P<esc>\\.)'                      # escaped character
+                        + r'|(?P<open>\{)|(?P<close>\})'        # block
+                        + r'|(?<![\w$@])(?P<cdef>cdef\s*\()'    # cdef( ... )
+                        + r'|(?<![\w$@])(?P<decl>global|local|constant|unglobal)\b'
+                        )
+token_kinds = {'xc': EXTENDED_COMMENT, 'str': STRING, 'sq': STRING, 'com': COMMENT}
+
+# tokens that matter when finding the end of the argument list of cdef( ... )
+paren_token_re = re.compile(r'"(?:[^"\\\n]|\\.)*"?' + r"|'(?:[^'\\\n]|\\.)*'?" + r'|\\.|(?<!\$)#[^\n]*|[()]')
+
+# rest of a declaration statement
+declaration_end_re = re.compile(r'(?:[^\n;#}]|(?<=\$)#)*')
+
+# keyword of a macro definition, at the start of its line
+def_keyword_re = re.compile(r'\s*(r?def)\b')
+
+
+class SpecSyntaxTree:
+    """
+    Syntax tree of a SPEC macro file, from its parser
+
+    The macro definitions are those the parser found, with their hidden
+    macros (names that start with ``_``), so the tree agrees with the findings
+    about where each macro body starts and ends, including the macros
+    defined within other macros, and the file is not lexed again.
+
+    :param obj parser: :class:`~sphinxcontrib.specmacrofileparser.SpecMacrofileParser`
+        (not in stream mode) of the SPEC macro file
+    """
+
+    def __init__(self, parser):
+        if parser.buf is None:
+            raise RuntimeError, "file not loaded (stream mode): " + parser.filename
+        self.parser = parser
+        self.buf = parser.buf
+        self.root = SpecSyntaxNode(self, FILE, 0, len(parser.buf))
+        self.levels = {}        # (kind, start, end) of a node: (kinds, starts, ends) of its children
+        self.defs = None        # macro definitions: [(start, end, body start, body end, objtype, name, args)]
+        self.def_starts = None
+
+    def nodes(self, kinds = None):
+        """generator: every node (of *kinds*, by name) in file order, depth first"""
+        return self.root.walk(kinds)
+
+    def _find_defs(self):
+        parser = self.parser
+        offsets = parser.line_offsets
+        buf = self.buf
+        defs = []
+        for item in parser.findings + parser.hidden:
+            if item.objtype not in macro_objtypes or type(item._body) is not tuple:
+                continue
+            line_start = offsets[item.start_line-1]
+            mo = def_keyword_re.match(buf, line_start)
+            start = mo.start(1)
+            body_start, body_end = item._body
+            quote = 1
+            if buf[body_end:body_end+1] == '\\':
+                quote = 2
+            defs.append((start, body_end + quote, body_start, body_end,
+                         item.objtype, item.name, item.args))
+        defs.sort()
+        self.defs = defs
+        self.def_starts = array('l', [d[0] for d in defs])
+
+    def _children(self, node):
+        key = (node.kind, node.start, node.end)
+        level = self.levels.get(key)
+        if level is None:
+            if node.kind == FILE:
+                level = self._scan(node.start, node.end)
+            elif node.kind == DEF:
+                d = self.defs[bisect_left(self.def_starts, node.start)]
+                level = self._scan(d[2], d[3])
+            elif node.kind == BLOCK:
+                level = self._scan(node.start + 1, node.end - 1)
+            elif node.kind == CDEF:
+                level = self._scan(self.buf.find('(', node.start) + 1, node.end - 1)
+            else:
+                level = (array('b'), array('l'), array('l'))
+            self.levels[key] = level
+        kinds, starts, ends = level
+        return [SpecSyntaxNode(self, kinds[i], starts[i], ends[i]) for i in xrange(len(kinds))]
+
+    def _scan(self, start, end):
+        """the nodes of the outermost structures within *start* .. *end*"""
+        if self.defs is None:
+            self._find_defs()
+        buf = self.buf
+        kinds, starts, ends = array('b'), array('l'), array('l')
+        defs, def_starts = self.defs, self.def_starts
+        d = bisect_left(def_starts, start)
+        depth = 0
+        block_start = None
+        pos = start
+        while pos < end:
+            # the code before the next macro definition in this span
+            while d < len(defs) and defs[d][0] < pos:
+                d += 1
+            stop = end
+            if d < len(defs) and defs[d][0] < end:
+                stop = defs[d][0]
+            mo = tree_token_re.search(buf, pos, stop)
+            if mo is None:
+                if stop == end:
+                    break
+                # a macro definition (inside a block:  that block's child)
+                if depth == 0:
+                    kinds.append(DEF)
+                    starts.append(defs[d][0])
+                    ends.append(defs[d][1])
+                pos = defs[d][1]
+                continue
+            token = mo.lastgroup
+            pos = mo.end()
+            if token == 'open':
+                if depth == 0:
+                    block_start = mo.start()
+                depth += 1
+            elif token == 'close':
+                if depth > 0:
+                    depth -= 1
+                    if depth == 0:
+                        kinds.append(BLOCK)
+                        starts.append(block_start)
+                        ends.append(pos)
+            elif token == 'cdef':
+                pos = _close_paren(buf, pos, end)
+                if depth == 0:
+                    kinds.append(CDEF)
+                    starts.append(mo.start())
+                    ends.append(pos)
+            elif token == 'decl':
+                pos = declaration_end_re.match(buf, pos, end).end()
+                if depth == 0:
+                    kinds.append(DECLARATION)
+                    starts.append(mo.start())
+                    ends.append(pos)
+            elif token in token_kinds and depth == 0:
+                kinds.append(token_kinds[token])
+                starts.append(mo.start())
+                ends.append(pos)
+        if depth > 0:
+            # a block that never ends:  to the end of the span
+            kinds.append(BLOCK)
+            starts.append(block_start)
+            ends.append(end)
+        return kinds, starts, ends
+
+
+class SpecSyntaxNode(object):
+    """
+    A node of a :class:`SpecSyntaxTree`:  its kind, and its span of the file
+
+    The text, the line numbers, and the children are found when asked for.
+    """
+
+    __slots__ = ('tree', 'kind', 'start', 'end')
+
+    def __init__(self, tree, kind, start, end):
+        self.tree = tree
+        self.kind = kind        # index in node_kinds
+        self.start = start      # offset in the file
+        self.end = end          # offset just after the node
+
+    def __repr__(self):
+        return '<%s %d-%d>' % (self.kind_name, self.start, self.end)
+
+    @property
+    def kind_name(self):
+        return node_kinds[self.kind]
+
+    @property
+    def text(self):
+        return self.tree.buf[self.start:self.end]
+
+    @property
+    def start_line(self):
+        return bisect_right(self.tree.parser.line_offsets, self.start)
+
+    @property
+    def end_line(self):
+        return bisect_right(self.tree.parser.line_offsets, max(self.start, self.end - 1))
+
+    @property
+    def children(self):
+        return self.tree._children(self)
+
+    @property
+    def name(self):
+        """
+        name of a macro definition, of a chained macro (``cdef``),
+        or of the first variable declared (None for other nodes)
+        """
+        if self.kind == DEF:
+            return self._def()[5]
+        if self.kind == CDEF:
+            text = self.text
+            return cdef_fields(parse_cdef_args(text[text.find('(')+1:-1])).get('name')
+        if self.kind == DECLARATION:
+            names = self.names
+            if len(names) > 0:
+                return names[0]
+        return None
+
+    @property
+    def names(self):
+        """names of the variables of a declaration"""
+        if self.kind != DECLARATION:
+            return []
+        objtype, content = (self.text.split(None, 1) + [''])[:2]
+        return [item.name for item in _declared_variables(objtype, content, self.start_line)]
+
+    @property
+    def objtype(self):
+        """object type of a macro definition, as in the parser's findings"""
+        if self.kind == DEF:
+            return self._def()[4]
+        return None
+
+    @property
+    def body(self):
+        """text of the body of a macro definition"""
+        if self.kind == DEF:
+            d = self._def()
+            return self.tree.buf[d[2]:d[3]]
+        return None
+
+    def _def(self):
+        tree = self.tree
+        return tree.defs[bisect_left(tree.def_starts, self.start)]
+
+    def walk(self, kinds = None):
+        """generator: the nodes within this one (of *kinds*, by name), depth first"""
+        for child in self.children:
+            if kinds is None or node_kinds[child.kind] in kinds:
+                yield child
+            for node in child.walk(kinds):
+                yield node
+
+
+def _close_paren(buf, pos, end):
+    """position after the ``)`` that closes the ``(`` before *pos* (or *end*)"""
+    depth = 1
+    while True:
+        mo = paren_token_re.search(buf, pos, end)
+        if mo is None:
+            return end
+        pos = mo.end()
+        token = mo.group()
+        if token == '(':
+            depth += 1
+        elif token == ')':
+            depth -= 1
+            if depth == 0:
+                return pos
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+
+'''
+time an incremental rebuild of 1 of 500 pages with 50k SPEC objects
+
+By default, the SPEC domain's own methods are timed:  purge a page
+and note its objects again, and purge every page.  With ``build``,
+a project of 500 pages is made in a temporary directory, built,
+and built again after one page is touched.
+
+    cd test; python benchmark_clear_doc.py [build]
+'''
+
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+TOPDIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(TOPDIR, 'sphinxcontrib'))
+from specdomain import SpecDomain
+
+
+PAGES = 500
+OBJECTS = 100       # per page
+OBJTYPES = ('def', 'rdef', 'cdef', 'global')
+
+
+class BenchmarkEnv:
+    '''just enough of a build environment for the domain'''
+
+    def __init__(self):
+        self.domaindata = {}
+        self.docname = None
+
+
+def note_page(domain, page):
+    domain.env.docname = 'page%03d' % page
+    for i in range(OBJECTS):
+        objtype = OBJTYPES[i % len(OBJTYPES)]
+        name = 'm%03d_%03d' % (page, i)
+        domain.note_object(objtype, name, 'spec.%s.%s' % (objtype, name))
+
+
+def domain_benchmark():
+    domain = SpecDomain(BenchmarkEnv())
+    for page in range(PAGES):
+        note_page(domain, page)
+    print '%d pages, %d objects' % (PAGES, len(domain.data['objects']))
+
+    t0 = time.time()
+    domain.clear_doc('page250')
+    note_page(domain, 250)
+    print 'purge and note again 1 page:  %8.2f ms' % (1e3*(time.time() - t0))
+
+    t0 = time.time()
+    for page in range(PAGES):
+        domain.clear_doc('page%03d' % page)
+    print 'purge all %d pages:          %8.2f ms' % (PAGES, 1e3*(time.time() - t0))
+    assert len(domain.data['objects']) == 0 and len(domain.data['names']) == 0
+
+
+def write_project(srcdir):
+    f = open(os.path.join(srcdir, 'conf.py'), 'w')
+    f.write("extensions = ['sphinxcontrib.specdomain']\nmaster_doc = 'index'\n")
+    f.close()
+    f = open(os.path.join(srcdir, 'index.rst'), 'w')
+    f.write('pages\n=====\n\n.. toctree::\n\n')
+    f.write(''.join(['   page%03d\n' % page for page in range(PAGES)]))
+    f.close()
+    for page in range(PAGES):
+        f = open(os.path.join(srcdir, 'page%03d.rst' % page), 'w')
+        f.write('page %d\n==========\n\n' % page)
+        for i in range(OBJECTS):
+            objtype = OBJTYPES[i % len(OBJTYPES)]
+            f.write('.. spec:%s:: m%03d_%03d\n\n' % (objtype, page, i))
+        # refer to an object on the next page
+        f.write('See :spec:def:`m%03d_000`.\n' % ((page + 1) % PAGES))
+        f.close()
+
+
+def sphinx_build(srcdir, outdir):
+    environ = dict(os.environ)
+    path = [os.path.abspath(TOPDIR)] + environ.get('PYTHONPATH', '').split(os.pathsep)
+    environ['PYTHONPATH'] = os.pathsep.join([item for item in path if item])
+    devnull = open(os.devnull, 'w')
+    t0 = time.time()
+    subprocess.check_call([sys.executable, '-m', 'sphinx', '-q', '-b', 'html', srcdir, outdir],
+                          env = environ, stderr = devnull)
+    dt = time.time() - t0
+    devnull.close()
+    return dt
+
+
+def build_benchmark():
+    tmpdir = tempfile.mkdtemp()
+    try:
+        srcdir = os.path.join(tmpdir, 'source')
+        outdir = os.path.join(tmpdir, 'html')
+        os.mkdir(srcdir)
+        write_project(srcdir)
+        print 'full build of %d pages, %d objects:  %.1f s' \
+            % (PAGES, PAGES*OBJECTS, sphinx_build(srcdir, outdir))
+        os.utime(os.path.join(srcdir, 'page250.rst'), None)
+        print 'rebuild after touching 1 page:  %.1f s' % sphinx_build(srcdir, outdir)
+        html = open(os.path.join(outdir, 'page249.html')).read()
+        assert 'page250.html#macro:def:m250_000:' in html, 'reference into the rebuilt page not resolved'
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    domain_benchmark()
+    if 'build' in sys.argv[1:]:
+        build_benchmark()
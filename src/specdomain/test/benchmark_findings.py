@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+
+'''
+memory taken by the findings of the macros/ corpus, scaled up 1000 times
+
+Each macro file is parsed again for every copy, and all findings
+are kept:  first as Finding records, then as the dicts that the parser
+used to make (``Finding.as_dict()``).  Each is measured in a process
+of its own, as the growth of its peak resident memory (Unix only).
+The Finding records refer to the text of their file (kept in memory,
+about 144 kB per copy), where the dicts keep copies of their text.
+
+    cd test; python benchmark_findings.py [copies]
+'''
+
+
+import glob
+import os
+import resource
+import subprocess
+import sys
+import time
+
+TOPDIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(TOPDIR, 'sphinxcontrib'))
+from specmacrofileparser import SpecMacrofileParser
+
+
+COPIES = 1000
+
+
+def peak_memory():
+    '''peak resident memory of this process (bytes)'''
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        return maxrss
+    return maxrss * 1024
+
+
+def keep_findings(kind, copies):
+    macrofiles = sorted(glob.glob(os.path.join(TOPDIR, 'macros', '*.mac')))
+    before = peak_memory()
+    t0 = time.time()
+    kept = []
+    for _ in range(copies):
+        for macrofile in macrofiles:
+            findings = SpecMacrofileParser(macrofile).findings
+            if kind == 'dict':
+                findings = [item.as_dict() for item in findings]
+            kept.append(findings)
+    count = sum(map(len, kept))
+    print '%-8s %8d findings  %7.1f MB  %6.1f s' \
+        % (kind, count, (peak_memory() - before)/1e6, time.time() - t0)
+
+
+def main():
+    copies = COPIES
+    if len(sys.argv) > 1:
+        copies = int(sys.argv[1])
+    print 'macros/ corpus x %d' % copies
+    for kind in ('Finding', 'dict'):
+        subprocess.check_call([sys.executable, __file__, '--keep', kind, str(copies)])
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--keep']:
+        keep_findings(sys.argv[2], int(sys.argv[3]))
+    else:
+        main()
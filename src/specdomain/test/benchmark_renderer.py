@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+
+'''
+compare the two renderers of autospecmacro on the macros/ corpus
+
+A project with one page for each file in macros/, and one page
+for all of them in one large file, is made in a temporary directory.
+It is built from scratch with ``autospecmacro_renderer`` set to *rest*
+and then to *nodes*.  The time spent reading the pages (where the
+renderers differ) and the whole build time are reported (best of
+several builds), and the HTML pages must be the same.
+
+    cd test; python benchmark_renderer.py [builds]
+'''
+
+
+import glob
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+TOPDIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+
+BUILDS = 3          # best of
+RENDERERS = ('rest', 'nodes')
+
+# conf.py of the project:  keeps the time spent reading the documents
+CONF_PY = '''
+import os, time
+extensions = ['sphinxcontrib.specdomain']
+master_doc = 'index'
+
+def setup(app):
+    started = []
+    def before_read(app, env, docnames):
+        started.append(time.time())
+    def updated(app, env):
+        f = open(os.path.join(app.outdir, 'read_time.txt'), 'w')
+        f.write(repr(time.time() - started[0]))
+        f.close()
+    app.connect('env-before-read-docs', before_read)
+    app.connect('env-updated', updated)
+'''
+
+
+def write_project(srcdir):
+    macrofiles = sorted(glob.glob(os.path.join(TOPDIR, 'macros', '*.mac')))
+    f = open(os.path.join(srcdir, 'conf.py'), 'w')
+    f.write(CONF_PY)
+    f.close()
+    # all of them in one file
+    allfile = os.path.join(srcdir, 'all_macros.mac')
+    f = open(allfile, 'w')
+    for macrofile in macrofiles:
+        f.write(open(macrofile).read().rstrip('\n') + '\n\n')
+    f.close()
+    macrofiles.append(allfile)
+    pages = []
+    for macrofile in macrofiles:
+        page = os.path.splitext(os.path.basename(macrofile))[0]
+        pages.append(page)
+        f = open(os.path.join(srcdir, page + '.rst'), 'w')
+        f.write('.. autospecmacro:: %s\n' % macrofile)
+        f.close()
+    f = open(os.path.join(srcdir, 'index.rst'), 'w')
+    f.write('macros\n======\n\n.. toctree::\n\n')
+    f.write(''.join(['   %s\n' % page for page in pages]))
+    f.close()
+    return pages
+
+
+def sphinx_build(srcdir, outdir, renderer):
+    environ = dict(os.environ)
+    path = [TOPDIR] + environ.get('PYTHONPATH', '').split(os.pathsep)
+    environ['PYTHONPATH'] = os.pathsep.join([item for item in path if item])
+    devnull = open(os.devnull, 'w')
+    t0 = time.time()
+    subprocess.check_call([sys.executable, '-m', 'sphinx', '-E', '-q', '-b', 'html',
+                           '-D', 'autospecmacro_renderer=' + renderer, srcdir, outdir],
+                          env = environ, stderr = devnull)
+    dt = time.time() - t0
+    devnull.close()
+    return float(open(os.path.join(outdir, 'read_time.txt')).read()), dt
+
+
+def main():
+    builds = BUILDS
+    if len(sys.argv) > 1:
+        builds = int(sys.argv[1])
+    tmpdir = tempfile.mkdtemp()
+    try:
+        srcdir = os.path.join(tmpdir, 'source')
+        os.mkdir(srcdir)
+        pages = write_project(srcdir)
+        for renderer in RENDERERS:
+            outdir = os.path.join(tmpdir, renderer)
+            times = [sphinx_build(srcdir, outdir, renderer) for _ in range(builds)]
+            print '%-6s %d pages:  reading %.2f s, build %.2f s  (best of %d)' \
+                % (renderer, len(pages), min([t[0] for t in times]), 
+                   min([t[1] for t in times]), builds)
+        differ = []
+        for page in pages:
+            html = [open(os.path.join(tmpdir, renderer, page + '.html')).read()
+                    for renderer in RENDERERS]
+            if html[0] != html[1]:
+                differ.append(page)
+        if len(differ) > 0:
+            print 'FAILED: the HTML differs for', ', '.join(differ)
+            sys.exit(1)
+        print 'OK:  the HTML of every page is the same'
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    main()
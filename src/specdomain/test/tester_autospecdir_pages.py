@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+
+'''
+check the pages written for an autospecdir directive with *pages*
+
+A project whose index documents a directory of macro files (with a
+subdirectory) on pages of their own is made in a temporary directory
+and built.  Each macro file must have its page, linked from the index,
+and a reference to one of its macros must lead there.  Then it is built
+again:  after one macro file changes (only its page is read), after
+one is removed (its page is gone), and after one is added.
+The script fails (exit status 1) if any of this differs.
+
+    cd test; python tester_autospecdir_pages.py
+'''
+
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+TOPDIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+
+# conf.py of the project:  keeps the names of the documents read
+CONF_PY = '''
+import os
+extensions = ['sphinxcontrib.specdomain']
+master_doc = 'index'
+
+def setup(app):
+    def before_read(app, env, docnames):
+        f = open(os.path.join(app.outdir, 'read_docs.txt'), 'w')
+        f.write(' '.join(sorted(docnames)))
+        f.close()
+    app.connect('env-before-read-docs', before_read)
+'''
+
+INDEX_RST = '''
+macros
+======
+
+.. autospecdir:: %s
+   :pages:
+   :include_subdirs:
+
+See :spec:def:`sub_macro`.
+'''
+
+
+def write(filename, text):
+    f = open(filename, 'w')
+    f.write(text)
+    f.close()
+
+
+def sphinx_build(srcdir, outdir):
+    '''build, and return the names of the documents read'''
+    environ = dict(os.environ)
+    path = [TOPDIR] + environ.get('PYTHONPATH', '').split(os.pathsep)
+    environ['PYTHONPATH'] = os.pathsep.join([item for item in path if item])
+    devnull = open(os.devnull, 'w')
+    subprocess.check_call([sys.executable, '-m', 'sphinx', '-q', '-b', 'html', srcdir, outdir],
+                          env = environ, stderr = devnull)
+    devnull.close()
+    return open(os.path.join(outdir, 'read_docs.txt')).read().split()
+
+
+def main():
+    tmpdir = tempfile.mkdtemp()
+    failed = []
+    def expect(title, found, expected):
+        if found != expected:
+            failed.append('%s:  expected %r, found %r' % (title, expected, found))
+    def check_pages(title, outdir, expected):
+        index = open(os.path.join(outdir, 'index.html')).read()
+        for name in ('move.mac', 'shutter.mac', 'sub/sub.mac', 'new.mac'):
+            page = 'specmacro/macros/%s' % name
+            found = (os.path.exists(os.path.join(srcdir, page + '.rst')),
+                     'href="%s.html"' % page in index)
+            expect('%s, %s (page, link)' % (title, name), found, (name in expected,)*2)
+    try:
+        srcdir = os.path.join(tmpdir, 'source')
+        outdir = os.path.join(tmpdir, 'html')
+        macrodir = os.path.join(srcdir, 'macros')
+        os.makedirs(os.path.join(macrodir, 'sub'))
+        for name in ('move.mac', 'shutter.mac'):
+            shutil.copy(os.path.join(TOPDIR, 'macros', name), macrodir)
+        submacro = os.path.join(macrodir, 'sub', 'sub.mac')
+        write(submacro, "#: in a subdirectory\ndef sub_macro '{ p 1 }'\n")
+        write(os.path.join(srcdir, 'conf.py'), CONF_PY)
+        write(os.path.join(srcdir, 'index.rst'), INDEX_RST % macrodir)
+
+        expect('first build', sphinx_build(srcdir, outdir),
+               ['index', 'specmacro/macros/move.mac', 'specmacro/macros/shutter.mac',
+                'specmacro/macros/sub/sub.mac'])
+        check_pages('first build', outdir, ['move.mac', 'shutter.mac', 'sub/sub.mac'])
+        page = open(os.path.join(outdir, 'specmacro', 'macros', 'shutter.mac.html')).read()
+        if 'shutter_open' not in page:
+            failed.append('shutter_open is not on the page of shutter.mac')
+        index = open(os.path.join(outdir, 'index.html')).read()
+        if 'href="specmacro/macros/sub/sub.mac.html#' not in index:
+            failed.append('the reference to sub_macro does not lead to its page')
+
+        write(submacro, "#: in a subdirectory\ndef sub_macro '{ p 2 }'\n")
+        expect('one file changed', sphinx_build(srcdir, outdir),
+               ['specmacro/macros/sub/sub.mac'])
+
+        os.remove(os.path.join(macrodir, 'move.mac'))
+        sphinx_build(srcdir, outdir)
+        check_pages('one file removed', outdir, ['shutter.mac', 'sub/sub.mac'])
+
+        write(os.path.join(macrodir, 'new.mac'), "def new_macro '{ p 3 }'\n")
+        expect('one file added', sphinx_build(srcdir, outdir),
+               ['index', 'specmacro/macros/new.mac'])
+        check_pages('one file added', outdir, ['new.mac', 'shutter.mac', 'sub/sub.mac'])
+    finally:
+        shutil.rmtree(tmpdir)
+    for text in failed:
+        print 'FAILED', text
+    if len(failed) > 0:
+        sys.exit(1)
+    print 'OK:  a page for each macro file, read again only when it changes'
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+
+'''
+check the edges of the call graph of a few macro files
+
+Each call graph must have exactly the (caller, callee) edges expected,
+and the macros expected must be unreachable.  Names in strings and
+comments are not calls, a cdef calls what its code calls, and a call
+through a hidden macro (a name that starts with ``_``) is a call.
+The script fails (exit status 1) if any differ.
+
+    cd test; python tester_call_graph.py
+'''
+
+
+import os
+import shutil
+import sys
+import tempfile
+
+TOPDIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(TOPDIR, 'sphinxcontrib'))
+from specmacroindex import SpecCallGraph
+
+
+DRIVER_MAC = '''\
+def main '{ _driver }'
+def _driver '{ helper }'
+def helper '{ p "helper" }'
+'''
+
+CHECK_MAC = '''\
+def usage '{ p "usage: check a b" }'
+def check '{
+    if ($# != 2) { usage; exit }  # not: helper
+    p "not: main"
+    helper
+}'
+cdef("user_precount", "check 1 2\\n", "tester")
+def orphan '{ p 1 }'
+'''
+
+
+def write(filename, text):
+    f = open(filename, 'w')
+    f.write(text)
+    f.close()
+
+
+def main():
+    tmpdir = tempfile.mkdtemp()
+    failed = []
+    def expect(title, found, expected):
+        if found != expected:
+            failed.append('%s:  expected %r, found %r' % (title, expected, found))
+    try:
+        driver = os.path.join(tmpdir, 'driver.mac')
+        check = os.path.join(tmpdir, 'check.mac')
+        write(driver, DRIVER_MAC)
+        write(check, CHECK_MAC)
+        graph = SpecCallGraph()
+        graph.refresh([driver])
+        expect('hidden', list(graph.edges()), [('_driver', 'helper'), ('main', '_driver')])
+        expect('hidden, unreachable', graph.unreachable(['main']), [])
+
+        graph.refresh([check])
+        expect('edges', list(graph.edges()),
+               [('_driver', 'helper'), ('check', 'helper'), ('check', 'usage'),
+                ('main', '_driver'), ('user_precount', 'check')])
+        expect('calls', graph.calls('check'), ['helper', 'usage'])
+        expect('called by', graph.called_by('helper'), ['_driver', 'check'])
+        expect('unreachable from main', graph.unreachable(['main']),
+               ['check', 'orphan', 'usage', 'user_precount'])
+        expect('never called', graph.unreachable(), ['main', 'orphan', 'user_precount'])
+
+        graph.remove(driver)
+        expect('removed', graph.macros(), ['check', 'orphan', 'usage', 'user_precount'])
+        expect('removed, calls', graph.calls('check'), ['usage'])
+    finally:
+        shutil.rmtree(tmpdir)
+    for text in failed:
+        print 'FAILED', text
+    if len(failed) > 0:
+        sys.exit(1)
+    print 'OK:  every call found, and no other'
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+
+'''
+check that pages are read again when their macro files change content
+
+A project with two pages that document the same macro file, and
+one that does not, is made in a temporary directory and built.
+Then it is built again:  after the macro file is only touched (no page
+is read), after its content changes (both of its pages are read, and
+show the change), and with no change at all (no page is read).
+The script fails (exit status 1) if other pages are read.
+
+    cd test; python tester_dependencies.py
+'''
+
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+TOPDIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+
+# conf.py of the project:  keeps the names of the documents read
+CONF_PY = '''
+import os
+extensions = ['sphinxcontrib.specdomain']
+master_doc = 'index'
+
+def setup(app):
+    def before_read(app, env, docnames):
+        f = open(os.path.join(app.outdir, 'read_docs.txt'), 'w')
+        f.write(' '.join(sorted(docnames)))
+        f.close()
+    app.connect('env-before-read-docs', before_read)
+'''
+
+MACROS = '''
+#: open the shutter
+def shopen '{ p "open" }'
+'''
+
+MORE_MACROS = '''
+#: close the shutter
+def shclose '{ p "close" }'
+'''
+
+
+def write(filename, text):
+    f = open(filename, 'w')
+    f.write(text)
+    f.close()
+
+
+def write_project(srcdir, macrofile):
+    write(os.path.join(srcdir, 'conf.py'), CONF_PY)
+    write(os.path.join(srcdir, 'index.rst'),
+          'pages\n=====\n\n.. toctree::\n\n   shutter\n   shutter_again\n   other\n')
+    write(os.path.join(srcdir, 'shutter.rst'), '.. autospecmacro:: %s\n' % macrofile)
+    write(os.path.join(srcdir, 'shutter_again.rst'), '.. autospecmacro:: %s\n' % macrofile)
+    write(os.path.join(srcdir, 'other.rst'), 'other\n=====\n\n.. spec:def:: nothing\n')
+    write(macrofile, MACROS)
+
+
+def sphinx_build(srcdir, outdir):
+    '''build, and return the names of the documents read'''
+    environ = dict(os.environ)
+    path = [TOPDIR] + environ.get('PYTHONPATH', '').split(os.pathsep)
+    environ['PYTHONPATH'] = os.pathsep.join([item for item in path if item])
+    devnull = open(os.devnull, 'w')
+    subprocess.check_call([sys.executable, '-m', 'sphinx', '-q', '-b', 'html', srcdir, outdir],
+                          env = environ, stderr = devnull)
+    devnull.close()
+    return open(os.path.join(outdir, 'read_docs.txt')).read().split()
+
+
+def main():
+    tmpdir = tempfile.mkdtemp()
+    failed = []
+    def expect(title, found, expected):
+        if found != expected:
+            failed.append('%s:  expected %r read, found %r' % (title, expected, found))
+    try:
+        srcdir = os.path.join(tmpdir, 'source')
+        outdir = os.path.join(tmpdir, 'html')
+        os.mkdir(srcdir)
+        macrofile = os.path.join(srcdir, 'shutter.mac')
+        write_project(srcdir, macrofile)
+        expect('first build', sphinx_build(srcdir, outdir),
+               ['index', 'other', 'shutter', 'shutter_again'])
+
+        later = time.time() + 10
+        os.utime(macrofile, (later, later))
+        expect('macro file touched', sphinx_build(srcdir, outdir), [])
+
+        write(macrofile, MACROS + MORE_MACROS)
+        expect('macro file changed', sphinx_build(srcdir, outdir), ['shutter', 'shutter_again'])
+        for page in ('shutter', 'shutter_again'):
+            if 'shclose' not in open(os.path.join(outdir, page + '.html')).read():
+                failed.append('%s.html does not show the change' % page)
+
+        expect('no change', sphinx_build(srcdir, outdir), [])
+    finally:
+        shutil.rmtree(tmpdir)
+    for text in failed:
+        print 'FAILED', text
+    if len(failed) > 0:
+        sys.exit(1)
+    print 'OK:  only the pages of a changed macro file are read again'
+
+
+if __name__ == '__main__':
+    main()
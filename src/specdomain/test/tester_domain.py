@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+
+'''
+check where the SPEC domain finds its objects, as documents are read and purged
+
+The objects are noted as the directives note them, in a few documents,
+and each lookup must give the document and target id that Sphinx
+would link to.  The script fails (exit status 1) if any lookup differs.
+
+    cd test; python tester_domain.py
+'''
+
+
+import os
+import sys
+
+TOPDIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(TOPDIR, 'sphinxcontrib'))
+from specdomain import SpecDomain
+
+
+class TesterEnv:
+    '''just enough of a build environment for the domain'''
+
+    def __init__(self):
+        self.domaindata = {}
+        self.docname = None
+
+
+def note(domain, docname, objtype, name):
+    domain.env.docname = docname
+    domain.note_object(objtype, name, '%s:%s:%s' % (docname, objtype, name))
+
+
+def find(domain, role, name):
+    '''what a reference with *role* to *name* resolves to:  (docname, objtype)'''
+    entry = domain.find_object(domain.objtypes_for_role(role), name)
+    if entry is None:
+        return None
+    docname, targetname, objtype = entry
+    assert targetname == '%s:%s:%s' % (docname, objtype, name), targetname
+    return docname, objtype
+
+
+def main():
+    failed = []
+    def expect(title, found, expected):
+        if found != expected:
+            failed.append('%s:  expected %r, found %r' % (title, expected, found))
+
+    domain = SpecDomain(TesterEnv())
+    note(domain, 'shutter', 'def', 'shopen')
+    note(domain, 'shutter', 'global', 'SHUTTER_PV')
+    note(domain, 'shutter', 'cdef', 'user_precount')
+    note(domain, 'motors', 'rdef', 'mv_all')
+    note(domain, 'motors', 'global', 'shopen')
+    expect('def role', find(domain, 'def', 'shopen'), ('shutter', 'def'))
+    expect('global role', find(domain, 'global', 'shopen'), ('motors', 'global'))
+    expect('def role finds a cdef', find(domain, 'def', 'user_precount'), ('shutter', 'cdef'))
+    expect('def role finds an rdef', find(domain, 'def', 'mv_all'), ('motors', 'rdef'))
+    expect('rdef role', find(domain, 'rdef', 'mv_all'), ('motors', 'rdef'))
+    expect('local role', find(domain, 'local', 'SHUTTER_PV'), None)
+    expect('unknown', find(domain, 'def', 'nothing'), None)
+
+    # the same macro in two documents:  the one read last is linked to
+    note(domain, 'shutter_old', 'def', 'shopen')
+    expect('read last', find(domain, 'def', 'shopen'), ('shutter_old', 'def'))
+    domain.clear_doc('shutter_old')
+    expect('purge the last', find(domain, 'def', 'shopen'), ('shutter', 'def'))
+    expect('purge keeps the global', find(domain, 'global', 'shopen'), ('motors', 'global'))
+    note(domain, 'shutter_old', 'def', 'shopen')
+    domain.clear_doc('shutter')
+    expect('purge the first', find(domain, 'def', 'shopen'), ('shutter_old', 'def'))
+    expect('purged', find(domain, 'global', 'SHUTTER_PV'), None)
+
+    # read the same document again
+    note(domain, 'shutter', 'def', 'shopen')
+    domain.clear_doc('shutter')
+    note(domain, 'shutter', 'def', 'shopen')
+    expect('read again', domain.data['names']['shopen'],
+           [('motors', 'motors:global:shopen', 'global'),
+            ('shutter_old', 'shutter_old:def:shopen', 'def'),
+            ('shutter', 'shutter:def:shopen', 'def')])
+
+    # documents read in another process (parallel builds)
+    other = SpecDomain(TesterEnv())
+    note(other, 'scans', 'def', 'ascan2')
+    note(other, 'scans', 'global', 'SHUTTER_PV')
+    note(other, 'unread', 'def', 'dscan2')
+    domain.merge_domaindata(['scans'], other.data)
+    expect('merged', find(domain, 'def', 'ascan2'), ('scans', 'def'))
+    expect('merged global', find(domain, 'global', 'SHUTTER_PV'), ('scans', 'global'))
+    expect('not merged', find(domain, 'def', 'dscan2'), None)
+
+    for docname in ('shutter', 'shutter_old', 'motors', 'scans'):
+        domain.clear_doc(docname)
+    expect('all purged', (domain.data['objects'], domain.data['names'], domain.data['docs']),
+           ({}, {}, {}))
+
+    for text in failed:
+        print 'FAILED', text
+    if len(failed) > 0:
+        sys.exit(1)
+    print 'OK:  every reference resolves to the document expected'
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+
+'''
+check the SPEC macro files that SpecMacroDirWalker finds in a directory tree
+
+A tree of macro files (and other files), with a symbolic link to a
+subdirectory, a symbolic link to a file, and a hard link, is made in a
+temporary directory.  Each file must be found once, by the first name
+in walk order, with and without subdirectories and glob patterns,
+and by one or more threads.  The script fails (exit status 1)
+if other files are found.
+
+    cd test; python tester_macrodir.py
+'''
+
+
+import os
+import shutil
+import sys
+import tempfile
+
+TOPDIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(TOPDIR, 'sphinxcontrib'))
+import specmacrodir
+from specmacrodir import SpecMacroDirWalker
+
+
+FILES = ('a.mac', 'c.mac', 'notes.txt', 'sub/d.mac', 'sub/deeper/e.mac', 'old/f.mac')
+
+CASES = [
+    ('this directory', dict(subdirs=False),
+     ['a.mac', 'c.mac']),
+    ('subdirectories', dict(),
+     ['a.mac', 'c.mac', 'old/f.mac', 'sub/d.mac', 'sub/deeper/e.mac']),
+    ('exclude a directory', dict(exclude=['old']),
+     ['a.mac', 'c.mac', 'sub/d.mac', 'sub/deeper/e.mac']),
+    ('exclude its files', dict(exclude='old/*, */deeper/*'),
+     ['a.mac', 'c.mac', 'sub/d.mac']),
+    ('include', dict(include=['sub/*.mac', '*.txt']),
+     ['notes.txt', 'sub/d.mac', 'sub/deeper/e.mac']),
+    ('include nothing', dict(include=[]),
+     []),
+    ]
+
+
+def make_tree(topdir):
+    for name in FILES:
+        filename = os.path.join(topdir, *name.split('/'))
+        if not os.path.exists(os.path.dirname(filename)):
+            os.makedirs(os.path.dirname(filename))
+        open(filename, 'w').close()
+    # the same files again, by other names:  each found after the first name
+    os.symlink(os.path.join(topdir, 'sub'), os.path.join(topdir, 'zlink'))
+    os.symlink(os.path.join(topdir, 'a.mac'), os.path.join(topdir, 'alias.mac'))
+    os.link(os.path.join(topdir, 'c.mac'), os.path.join(topdir, 'hard.mac'))
+    # a link that points nowhere, and a directory that links back up
+    os.symlink(os.path.join(topdir, 'gone.mac'), os.path.join(topdir, 'dangling.mac'))
+    os.symlink(topdir, os.path.join(topdir, 'sub', 'up'))
+
+
+def main():
+    tmpdir = tempfile.mkdtemp()
+    failed = []
+    try:
+        topdir = os.path.join(tmpdir, 'macros')
+        make_tree(topdir)
+        listers = [('scandir', specmacrodir.scandir), ('listdir', None)]
+        if specmacrodir.scandir is None:
+            listers = listers[1:]
+        for lister, scandir in listers:
+            specmacrodir.scandir = scandir
+            for workers in (1, 4):
+                for title, options, expected in CASES:
+                    walker = SpecMacroDirWalker(workers=workers, **options)
+                    found = walker.walk(topdir)
+                    expected = [os.path.join(topdir, *name.split('/')) for name in expected]
+                    if found != expected:
+                        failed.append('%s (%s, %d workers):  expected %r, found %r'
+                                      % (title, lister, workers, expected, found))
+            if SpecMacroDirWalker().walk(os.path.join(tmpdir, 'none')) != []:
+                failed.append('no such directory (%s):  found files' % lister)
+    finally:
+        shutil.rmtree(tmpdir)
+    for text in failed:
+        print 'FAILED', text
+    if len(failed) > 0:
+        sys.exit(1)
+    print 'OK:  %d cases, each file found once' % len(CASES)
+
+
+if __name__ == '__main__':
+    main()
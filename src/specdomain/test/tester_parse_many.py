@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+
+'''
+check that SpecMacrofileParser.parse_many() finds what one parser at a time finds
+
+The files of macros/ are parsed in worker processes, with and without
+an on-disk cache, and the parsers must come back in the order of the
+files, with the same findings (and hidden items) as each file parsed
+by itself.  The script fails (exit status 1) if any differ.
+
+    cd test; python tester_parse_many.py
+'''
+
+
+import glob
+import os
+import shutil
+import sys
+import tempfile
+
+TOPDIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(TOPDIR, 'sphinxcontrib'))
+from specmacrofileparser import SpecMacrofileParser
+from specmacrofilecache import SpecDiskCache
+
+
+WORKERS = 2
+
+
+def summary(parser):
+    '''what must be the same however the file was parsed'''
+    return [(item.start_line, item.end_line, item.objtype, item.name, item.args,
+             item.description, item.body)
+            for item in parser.findings + parser.hidden]
+
+
+def compare(title, macrofiles, parsers, failed):
+    if [parser.filename for parser in parsers] != macrofiles:
+        failed.append('%s:  the parsers are not in the order of the files' % title)
+        return
+    for macrofile, parser in zip(macrofiles, parsers):
+        if summary(parser) != summary(SpecMacrofileParser(macrofile)):
+            failed.append('%s:  %s' % (title, os.path.basename(macrofile)))
+
+
+def main():
+    macrodir = os.path.join(TOPDIR, 'macros')
+    macrofiles = sorted(glob.glob(os.path.join(macrodir, '*.mac')))
+    failed = []
+    compare('workers', macrofiles,
+            SpecMacrofileParser.parse_many(macrofiles, workers=WORKERS), failed)
+    compare('one file at a time', macrofiles,
+            SpecMacrofileParser.parse_many(macrofiles, workers=WORKERS, chunksize=1), failed)
+    compare('directory', macrofiles,
+            SpecMacrofileParser.parse_many(macrodir, workers=WORKERS), failed)
+    tmpdir = tempfile.mkdtemp()
+    try:
+        cache = SpecDiskCache(tmpdir)
+        compare('cache, first', macrofiles,
+                SpecMacrofileParser.parse_many(macrofiles, workers=WORKERS, cache=cache), failed)
+        compare('cache, again', macrofiles,
+                SpecMacrofileParser.parse_many(macrofiles, workers=WORKERS, cache=cache), failed)
+    finally:
+        shutil.rmtree(tmpdir)
+    for text in failed:
+        print 'FAILED', text
+    if len(failed) > 0:
+        sys.exit(1)
+    print 'OK:  %d files, the same findings in parallel as one at a time' % len(macrofiles)
+
+
+if __name__ == '__main__':
+    main()
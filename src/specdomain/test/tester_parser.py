@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+
+'''
+check the findings of the SPEC macro file parser on small inputs
+
+Each case is a few lines of SPEC code and the items the parser
+must find in them:  (start line, end line, objtype, name).
+The script fails (exit status 1) if any case finds other items.
+
+    cd test; python tester_parser.py
+'''
+
+
+import os
+import shutil
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'sphinxcontrib'))
+from specmacrofileparser import SpecMacrofileParser
+
+
+CASES = [
+    ('$# in a one-line def',
+     ["def f 'p $#'",
+      "global G",
+      ],
+     [(1, 1, 'def', 'f'), (2, 2, 'global', 'G')]),
+    ('$# in a condition',
+     ["def g '{ if ($# == 1) p \"one\" }'",
+      "def h '{",
+      "    if ($# != 2) { p \"usage: h a b\"; exit }  # the usage",
+      "}'",
+      ],
+     [(1, 1, 'def', 'g'), (2, 4, 'def', 'h')]),
+    ('$# in a cdef',
+     ["cdef(\"user_precount\", \"if ($# > 0) p $1\\n\", \"cnt\")",
+      "global H",
+      ],
+     [(1, 1, 'cdef', 'user_precount'), (2, 2, 'global', 'H')]),
+    ('a comment after code',
+     ["def k '{ p 1 }'  # ends here, with a quote: '",
+      "global K",
+      ],
+     [(1, 1, 'def', 'k'), (2, 2, 'global', 'K')]),
+    ]
+
+
+def findings(filename):
+    parser = SpecMacrofileParser(filename)
+    return [(item.start_line, item.end_line, item.objtype, item.name)
+            for item in parser.findings
+            if item.objtype not in ('descriptive comment', 'extended comment')]
+
+
+def main():
+    tmpdir = tempfile.mkdtemp()
+    failed = []
+    try:
+        for i, (title, lines, expected) in enumerate(CASES):
+            filename = os.path.join(tmpdir, 'case%d.mac' % i)
+            f = open(filename, 'w')
+            f.write('\n'.join(lines) + '\n')
+            f.close()
+            found = findings(filename)
+            if found != expected:
+                failed.append('%s:  expected %r, found %r' % (title, expected, found))
+    finally:
+        shutil.rmtree(tmpdir)
+    for text in failed:
+        print 'FAILED', text
+    if len(failed) > 0:
+        sys.exit(1)
+    print 'OK:  %d cases' % len(CASES)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+
+'''
+check that the reST of a macro file from the cache is the reST rendered afresh
+
+The files of macros/ are rendered as a build does:  first parsed
+and rendered, then from the reST cache, then (as in a later build) from
+the on-disk cache alone, without parsing.  Each time, the lines must be
+the same as those rendered while the file is parsed (stream mode,
+never cached).  A file whose content changes must be rendered again.
+The script fails (exit status 1) if any differ.
+
+    cd test; python tester_rest_cache.py
+'''
+
+
+import glob
+import os
+import shutil
+import sys
+import tempfile
+
+TOPDIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(TOPDIR, 'sphinxcontrib'))
+import specdomain
+
+
+class TesterConfig:
+    autospecmacro_cache = True
+    autospecmacro_cache_dir = 'cache'
+    autospecmacro_cache_size = 50*1024*1024
+    autospecmacro_stream_size = 0
+
+
+class TesterEnv:
+    '''just enough of a build environment for the reST of a macro file'''
+
+    def __init__(self, srcdir):
+        self.config = TesterConfig()
+        self.srcdir = srcdir
+        self.doctreedir = os.path.join(srcdir, 'doctrees')
+
+
+def rest(env, macrofile):
+    digest, lines, warnings = specdomain.macro_rest(env, macrofile)     #@UnusedVariable
+    return list(lines), list(warnings)
+
+
+def streamed(env, macrofile):
+    env.config.autospecmacro_stream_size = 1
+    try:
+        return rest(env, macrofile)
+    finally:
+        env.config.autospecmacro_stream_size = 0
+
+
+def main():
+    tmpdir = tempfile.mkdtemp()
+    failed = []
+    def expect(title, found, expected):
+        if found != expected:
+            failed.append('%s:  expected %r, found %r' % (title, expected, found))
+    try:
+        env = TesterEnv(tmpdir)
+        macrofiles = sorted(glob.glob(os.path.join(TOPDIR, 'macros', '*.mac')))
+        expected = dict([(f, streamed(env, f)) for f in macrofiles])
+        rest_cache, parser_cache = specdomain.rest_cache, specdomain.parser_cache
+        for title in ('rendered', 'from memory', 'from disk'):
+            if title == 'from disk':
+                rest_cache.clear()          # as in a later build
+                parser_cache.clear()
+            rest_cache.hits = rest_cache.misses = 0
+            for macrofile in macrofiles:
+                if rest(env, macrofile) != expected[macrofile]:
+                    failed.append('%s:  %s' % (title, os.path.basename(macrofile)))
+            hits = {'rendered': 0}.get(title, len(macrofiles))
+            expect(title + ', cache hits', rest_cache.hits, hits)
+        expect('from disk, files parsed', parser_cache.misses, 0)
+
+        # the content of a file changes
+        macrofile = os.path.join(tmpdir, 'shutter.mac')
+        shutil.copy(os.path.join(TOPDIR, 'macros', 'shutter.mac'), macrofile)
+        before = rest(env, macrofile)
+        f = open(macrofile, 'a')
+        f.write("\n#: added to the file\ndef tester_added '{ p 1 }'\n")
+        f.close()
+        after = rest(env, macrofile)
+        expect('changed content', after, streamed(env, macrofile))
+        if after == before:
+            failed.append('changed content:  the reST from before the change')
+    finally:
+        shutil.rmtree(tmpdir)
+    for text in failed:
+        print 'FAILED', text
+    if len(failed) > 0:
+        sys.exit(1)
+    print 'OK:  %d files, the same reST from the caches as rendered' % len(macrofiles)
+
+
+if __name__ == '__main__':
+    main()
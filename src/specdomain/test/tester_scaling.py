@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+
+'''
+check that the SPEC macro file parser takes linear time on malformed input
+
+Each input is made at 1k, 10k, and 100k lines.  The script fails
+(exit status 1) if the time to parse grows much faster than the size.
+
+    cd test; python tester_scaling.py
+'''
+
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'sphinxcontrib'))
+from specmacrofileparser import SpecMacrofileParser
+
+
+SIZES = (1000, 10000, 100000)
+SLACK = 3.0         # allowed growth of the time per line, from one size to the next
+REPEAT = 3          # best of, for each size
+
+
+def unclosed_def(n):
+    '''a def whose body never ends, then ordinary code'''
+    lines = ["def broken '"]
+    lines += ['    p "line %d"; x%d = %d  # comment' % (i, i, i) for i in range(n-1)]
+    return lines
+
+
+def nested_unclosed_quote(n):
+    '''defs within a def, each opened with \\' and never closed'''
+    lines = ["def outer '"]
+    lines += ["    def inner%d \\'{ p %d" % (i, i) for i in range(n-1)]
+    return lines
+
+
+def quote_run(n):
+    '''lines of quotes:  empty strings, extended comment markers, and stray single quotes'''
+    return ['x%d = """""""" \'\'\'\' "" \'"\' """' % i for i in range(n)]
+
+
+def unterminated_string(n):
+    '''strings that never end on their line, in a def and out'''
+    lines = []
+    for i in range(n):
+        if i % 100 == 0:
+            lines.append("def m%d '{" % i)
+        lines.append('    p "unterminated %d, with a \' and a { in it' % i)
+    return lines
+
+
+def time_parse(filename):
+    best = None
+    for _ in range(REPEAT):
+        t0 = time.time()
+        parser = SpecMacrofileParser(filename)
+        dt = time.time() - t0
+        if best is None or dt < best:
+            best = dt
+    return best, len(parser.warnings)
+
+
+def main():
+    tmpdir = tempfile.mkdtemp()
+    failed = []
+    try:
+        for maker in (unclosed_def, nested_unclosed_quote, quote_run, unterminated_string):
+            times = []
+            for n in SIZES:
+                filename = os.path.join(tmpdir, '%s_%d.mac' % (maker.__name__, n))
+                f = open(filename, 'w')
+                f.write('\n'.join(maker(n)) + '\n')
+                f.close()
+                dt, warnings = time_parse(filename)
+                times.append(dt)
+                print '%-24s %7d lines  %8.3f s  %6.2f us/line  %d warnings' \
+                    % (maker.__name__, n, dt, 1e6*dt/n, warnings)
+            for (n1, t1), (n2, t2) in zip(zip(SIZES, times), zip(SIZES, times)[1:]):
+                growth = (t2/max(t1, 1e-3)) / (float(n2)/n1)
+                if growth > SLACK:
+                    failed.append('%s: %d to %d lines, time per line grew %.1fx'
+                                  % (maker.__name__, n1, n2, growth))
+    finally:
+        shutil.rmtree(tmpdir)
+    for text in failed:
+        print 'FAILED', text
+    if len(failed) > 0:
+        sys.exit(1)
+    print 'OK:  parse time grows linearly with the size of the input'
+
+
+if __name__ == '__main__':
+    main()
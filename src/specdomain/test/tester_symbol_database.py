@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+
+'''
+check the SQLite symbol database and its full-text search
+
+Two macro files are indexed in a database file.  Each lookup and
+search must give the rows expected, a malformed search must raise
+ValueError, and the database must agree with the symbol index
+on the macros/ corpus.  Only changed files are indexed again, also
+when the database file is opened again.  The script fails (exit
+status 1) if any differ.
+
+    cd test; python tester_symbol_database.py
+'''
+
+
+import glob
+import os
+import shutil
+import sys
+import tempfile
+
+TOPDIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(TOPDIR, 'sphinxcontrib'))
+from specmacroindex import SpecSymbolDatabase, SpecSymbolIndex
+
+
+SHUTTER_MAC = '''\
+#: EPICS PV of the fast shutter
+global SHUTTER_PV
+
+#: open the fast shutter
+def shopen '{ _shutter_move 1 }'
+
+def _shutter_move '{ epics_put(SHUTTER_PV, $1) }'
+
+#: close the fast shutter, if given no arguments
+def shclose '{ if ($# == 0) _shutter_move 0 }'
+'''
+
+MOTORS_MAC = '''\
+#: move all motors home
+def mv_home '{ p "home" }'
+'''
+
+
+def write(filename, text):
+    f = open(filename, 'w')
+    f.write(text)
+    f.close()
+
+
+def main():
+    tmpdir = tempfile.mkdtemp()
+    failed = []
+    def expect(title, found, expected):
+        if found != expected:
+            failed.append('%s:  expected %r, found %r' % (title, expected, found))
+    try:
+        shutter = os.path.join(tmpdir, 'shutter.mac')
+        motors = os.path.join(tmpdir, 'motors.mac')
+        write(shutter, SHUTTER_MAC)
+        write(motors, MOTORS_MAC)
+        dbfile = os.path.join(tmpdir, 'symbols.db')
+        db = SpecSymbolDatabase(dbfile)
+        expect('indexed', db.refresh([shutter, motors]), [shutter, motors])
+
+        expect('lookup', db.lookup('shclose'), [(shutter, 10, 'def')])
+        expect('lookup hidden', db.lookup('_shutter_move'), [(shutter, 7, 'def')])
+        expect('lookup hidden, not shown', db.lookup('_shutter_move', hidden=False), [])
+        expect('prefix', db.prefix('sh'), ['shclose', 'shopen'])
+        expect('prefix, not hidden', db.prefix('', hidden=False),
+               ['SHUTTER_PV', 'mv_home', 'shclose', 'shopen'])
+        expect('search', sorted([row[0] for row in db.search('shutter')]),
+               ['SHUTTER_PV', '_shutter_move', 'shclose', 'shopen'])
+        expect('search, objtypes', [row[:2] for row in db.search('shutter', ['global'])],
+               [('SHUTTER_PV', 'global')])
+        expect('search, prefix', [row[0] for row in db.search('mot*')], ['mv_home'])
+        expect('search, or', sorted([row[0] for row in db.search('home OR open')]),
+               ['mv_home', 'shopen'])
+        expect('search, summary', db.search('home'),
+               [('mv_home', 'def', motors, 2, 'move all motors home')])
+        for query in ('"shutter', '-', 'shutter AND', '('):
+            try:
+                db.search(query)
+                failed.append('search %r:  no ValueError' % query)
+            except ValueError:
+                pass
+        db.close()
+
+        write(motors, MOTORS_MAC.replace('mv_home', 'mv_park'))
+        db = SpecSymbolDatabase(dbfile)
+        expect('opened again, changed', db.refresh([shutter, motors]), [motors])
+        expect('opened again, lookup', (db.lookup('mv_home'), db.lookup('mv_park')),
+               ([], [(motors, 2, 'def')]))
+        db.remove(motors)
+        expect('removed', db.filenames(), [shutter])
+        db.close()
+
+        # the database and the symbol index agree
+        macrofiles = sorted(glob.glob(os.path.join(TOPDIR, 'macros', '*.mac')))
+        db = SpecSymbolDatabase()
+        db.refresh(macrofiles)
+        index = SpecSymbolIndex()
+        index.refresh(macrofiles)
+        expect('macros/, names', db.prefix(''), index.prefix(''))
+        for name in index.prefix(''):
+            if db.lookup(name) != index.lookup(name):
+                failed.append('macros/, %s:  %r in the database, %r in the index'
+                              % (name, db.lookup(name), index.lookup(name)))
+        db.close()
+    finally:
+        shutil.rmtree(tmpdir)
+    for text in failed:
+        print 'FAILED', text
+    if len(failed) > 0:
+        sys.exit(1)
+    print 'OK:  the database finds what the index finds, and searches its descriptions'
+
+
+if __name__ == '__main__':
+    main()
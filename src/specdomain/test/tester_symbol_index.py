@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+
+'''
+check where the library symbol index finds each macro and variable
+
+Two macro files, with a macro defined in both and hidden macros
+(names that start with ``_``), are indexed.  Each lookup, prefix,
+and duplicate report must give the locations expected, also after
+a file changes or is removed.  A parser in stream mode must not keep
+the hidden items.  The script fails (exit status 1) if any differ.
+
+    cd test; python tester_symbol_index.py
+'''
+
+
+import os
+import shutil
+import sys
+import tempfile
+
+TOPDIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(TOPDIR, 'sphinxcontrib'))
+from specmacrofileparser import SpecMacrofileParser
+from specmacroindex import SpecSymbolIndex
+
+
+SHUTTER_MAC = '''\
+global SHUTTER_PV
+def shopen '{ _shutter_move 1 }'
+def _shutter_move '{ epics_put(SHUTTER_PV, $1) }'
+def shclose 'p $#'
+rdef mv_all '{ _shutter_move 0 }'
+'''
+
+BEAMLINE_MAC = '''\
+constant BEAMLINE 32
+def shopen '{ p "open" }'
+def _shutter_move '{ p $1 }'
+cdef("user_precount", "shopen\\n", "shutter")
+'''
+
+
+def write(filename, text):
+    f = open(filename, 'w')
+    f.write(text)
+    f.close()
+
+
+def main():
+    tmpdir = tempfile.mkdtemp()
+    failed = []
+    def expect(title, found, expected):
+        if found != expected:
+            failed.append('%s:  expected %r, found %r' % (title, expected, found))
+    try:
+        shutter = os.path.join(tmpdir, 'shutter.mac')
+        beamline = os.path.join(tmpdir, 'beamline.mac')
+        write(shutter, SHUTTER_MAC)
+        write(beamline, BEAMLINE_MAC)
+        index = SpecSymbolIndex()
+        expect('indexed', index.refresh([shutter, beamline]), [shutter, beamline])
+        expect('unchanged', index.refresh([shutter, beamline]), [])
+
+        expect('lookup', index.lookup('shopen'), [(beamline, 2, 'def'), (shutter, 2, 'def')])
+        expect('lookup, objtypes', index.lookup('shopen', ['rdef']), [])
+        expect('lookup a variable', index.lookup('SHUTTER_PV'), [(shutter, 1, 'global')])
+        expect('lookup a cdef', index.lookup('user_precount'), [(beamline, 4, 'cdef')])
+        expect('lookup after $#', index.lookup('mv_all'), [(shutter, 5, 'rdef')])
+        expect('lookup hidden', index.lookup('_shutter_move'),
+               [(beamline, 3, 'def'), (shutter, 3, 'def')])
+        expect('lookup hidden, not shown', index.lookup('_shutter_move', hidden=False), [])
+        expect('prefix', index.prefix('sh'), ['shclose', 'shopen'])
+        expect('prefix hidden', index.prefix('_'), ['_shutter_move'])
+        expect('prefix hidden, not shown', index.prefix('_', hidden=False), [])
+        expect('duplicates', sorted(index.duplicates()), ['_shutter_move', 'shopen'])
+        expect('duplicates, not hidden', sorted(index.duplicates(hidden=False)), ['shopen'])
+
+        write(beamline, BEAMLINE_MAC.replace('def shopen', 'def bl_open'))
+        expect('changed', index.refresh([shutter, beamline]), [beamline])
+        expect('changed, lookup', index.lookup('shopen'), [(shutter, 2, 'def')])
+        expect('changed, new name', index.lookup('bl_open'), [(beamline, 2, 'def')])
+        index.remove(beamline)
+        expect('removed', index.filenames(), [shutter])
+        expect('removed, prefix', index.prefix('b'), [])
+
+        # stream mode:  the same findings, and no hidden items kept
+        parser = SpecMacrofileParser(shutter, stream=True)
+        names = [item.name for item in parser.iter_findings()]
+        expect('stream mode', names, [item.name for item in SpecMacrofileParser(shutter).findings])
+        expect('stream mode, hidden', parser.hidden, [])
+    finally:
+        shutil.rmtree(tmpdir)
+    for text in failed:
+        print 'FAILED', text
+    if len(failed) > 0:
+        sys.exit(1)
+    print 'OK:  every symbol found where it is defined'
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+
+'''
+check the shape of the syntax tree of SPEC macro files
+
+The tree of a small macro file must have exactly the nodes expected:
+(kind, start line, end line, name, [children]).  In shon (in
+macros/shutter.mac), the braces after ``$#`` must nest as written.
+For each file of macros/, each node must lie within its parent,
+and the macro definitions of the tree must be those of the parser.
+The script fails (exit status 1) if any differ.
+
+    cd test; python tester_syntax_tree.py
+'''
+
+
+import glob
+import os
+import shutil
+import sys
+import tempfile
+
+TOPDIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(TOPDIR, 'sphinxcontrib'))
+from specmacrofileparser import SpecMacrofileParser, macro_objtypes
+from specmacrotree import SpecSyntaxTree
+
+
+TREE_MAC = '''\
+"""extended comment"""
+global SHUTTER_PV, _PRIVATE
+def shon '{
+    # a comment
+    if ($# == 0) {
+        p "no {arguments}"
+    } else {
+        cdef("user_precount", "p $#\\\\n", "sh")
+    }
+    def _inner \\'{ p \\'x\\' }\\'
+}'
+p 'single {quoted}'
+'''
+
+TREE = [
+    ('extended comment', 1, 1, None),
+    ('declaration', 2, 2, 'SHUTTER_PV'),
+    ('def', 3, 11, 'shon', [
+        ('block', 3, 11, None, [
+            ('comment', 4, 4, None),
+            ('block', 5, 7, None, [
+                ('string', 6, 6, None)]),
+            ('block', 7, 9, None, [
+                ('cdef', 8, 8, 'user_precount', [
+                    ('string', 8, 8, None),
+                    ('string', 8, 8, None),
+                    ('string', 8, 8, None)])]),
+            ('def', 10, 10, '_inner', [
+                ('block', 10, 10, None)])])]),
+    ('string', 12, 12, None),
+    ]
+
+# shon in macros/shutter.mac, to the depth of its blocks
+SHON = ('def', 258, 296, 'shon', [
+    ('block', 258, 296, None, [
+        ('comment', 259, 259, None),
+        ('block', 261, 263, None),
+        ('block', 263, 265, None),
+        ('block', 265, 272, None),
+        ('block', 274, 285, None),
+        ('block', 285, 294, None),
+        ])])
+
+
+def shape(node, depth = None):
+    '''(kind, start line, end line, name[, [children]]) of *node*'''
+    children = []
+    if depth is None or depth > 0:
+        children = node.children
+    if len(children) == 0:
+        return (node.kind_name, node.start_line, node.end_line, node.name)
+    if depth is not None:
+        depth -= 1
+    return (node.kind_name, node.start_line, node.end_line, node.name,
+            [shape(child, depth) for child in children])
+
+
+def nested(node):
+    '''are all the nodes within *node* within their parents?'''
+    for child in node.children:
+        if child.start < node.start or child.end > node.end or not nested(child):
+            return False
+    return True
+
+
+def main():
+    tmpdir = tempfile.mkdtemp()
+    failed = []
+    def expect(title, found, expected):
+        if found != expected:
+            failed.append('%s:  expected %r, found %r' % (title, expected, found))
+    try:
+        filename = os.path.join(tmpdir, 'tree.mac')
+        f = open(filename, 'w')
+        f.write(TREE_MAC)
+        f.close()
+        tree = SpecSyntaxTree(SpecMacrofileParser(filename))
+        expect('tree', [shape(node) for node in tree.root.children], TREE)
+        expect('declared', tree.root.children[1].names, ['SHUTTER_PV', '_PRIVATE'])
+        expect('defs', [(node.name, node.objtype) for node in tree.nodes(['def'])],
+               [('shon', 'def'), ('_inner', 'def')])
+    finally:
+        shutil.rmtree(tmpdir)
+
+    tree = SpecSyntaxTree(SpecMacrofileParser(os.path.join(TOPDIR, 'macros', 'shutter.mac')))
+    shon = [node for node in tree.nodes(['def']) if node.name == 'shon']
+    expect('shon', [shape(node, 2) for node in shon], [SHON])
+
+    for macrofile in sorted(glob.glob(os.path.join(TOPDIR, 'macros', '*.mac'))):
+        parser = SpecMacrofileParser(macrofile)
+        tree = SpecSyntaxTree(parser)
+        title = os.path.basename(macrofile)
+        if not nested(tree.root):
+            failed.append('%s:  a node outside of its parent' % title)
+        defs = sorted([(item.start_line, item.name) for item in parser.findings + parser.hidden
+                       if item.objtype in macro_objtypes and type(item._body) is tuple])
+        expect(title + ', defs',
+               sorted([(node.start_line, node.name) for node in tree.nodes(['def'])]), defs)
+
+    for text in failed:
+        print 'FAILED', text
+    if len(failed) > 0:
+        sys.exit(1)
+    print 'OK:  each tree has the shape of its code'
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+
+'''
+check where the usage index finds each variable read and given a value
+
+Each usage is (file, line, macro around it, assigned).  The names
+in strings and comments, and in the declarations, are not usages;
+a name after ``$#`` is; a macro within a macro (and a hidden macro)
+is the macro around the lines of its body.  Variables given a value
+in the global scope, and declared nowhere, are reported.  The script
+fails (exit status 1) if any differ.
+
+    cd test; python tester_usage_index.py
+'''
+
+
+import os
+import shutil
+import sys
+import tempfile
+
+TOPDIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(TOPDIR, 'sphinxcontrib'))
+from specmacroindex import SpecUsageIndex
+
+
+COUNTERS_MAC = '''\
+global NARGS COUNT_TIME
+constant MAX_TIME 100
+COUNT_TIME = 1
+ROI_START = 10
+def count_setup '{
+    if ($# > 0) NARGS = $1; p "NARGS is not a usage"  # nor is COUNT_TIME
+    COUNT_TIME[0] += MAX_TIME
+    def _count_inner \\'{
+        NARGS = 2
+    }\\'
+    p NARGS
+}'
+p COUNT_TIME
+'''
+
+SCANS_MAC = '''\
+def scan_setup '{ ROI_START = 1; p COUNT_TIME }'
+ROI_END = ROI_START + 1
+_PRIVATE = 1
+'''
+
+
+def write(filename, text):
+    f = open(filename, 'w')
+    f.write(text)
+    f.close()
+
+
+def main():
+    tmpdir = tempfile.mkdtemp()
+    failed = []
+    def expect(title, found, expected):
+        if found != expected:
+            failed.append('%s:  expected %r, found %r' % (title, expected, found))
+    try:
+        counters = os.path.join(tmpdir, 'counters.mac')
+        scans = os.path.join(tmpdir, 'scans.mac')
+        write(counters, COUNTERS_MAC)
+        write(scans, SCANS_MAC)
+        index = SpecUsageIndex()
+        index.refresh([counters, scans])
+        expect('variables', index.variables(), ['COUNT_TIME', 'MAX_TIME', 'NARGS'])
+        expect('NARGS', index.usages('NARGS'),
+               [(counters, 6, 'count_setup', True),
+                (counters, 9, '_count_inner', True),
+                (counters, 11, 'count_setup', False)])
+        expect('COUNT_TIME', index.usages('COUNT_TIME'),
+               [(counters, 3, None, True),
+                (counters, 7, 'count_setup', True),
+                (counters, 13, None, False),
+                (scans, 1, 'scan_setup', False)])
+        expect('MAX_TIME', index.usages('MAX_TIME'), [(counters, 7, 'count_setup', False)])
+        expect('undeclared', index.undeclared(),
+               {'ROI_START': [(counters, 4)], 'ROI_END': [(scans, 2)]})
+
+        write(scans, SCANS_MAC.replace('ROI_END', 'global ROI_END\nROI_END'))
+        index.refresh([scans])
+        expect('declared later', index.undeclared(), {'ROI_START': [(counters, 4)]})
+        index.remove(counters)
+        expect('removed', index.usages('COUNT_TIME'), [(scans, 1, 'scan_setup', False)])
+    finally:
+        shutil.rmtree(tmpdir)
+    for text in failed:
+        print 'FAILED', text
+    if len(failed) > 0:
+        sys.exit(1)
+    print 'OK:  every usage found, and no other'
+
+
+if __name__ == '__main__':
+    main()